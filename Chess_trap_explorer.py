@@ -1,33 +1,44 @@
 import re
 import io
+import sys
+import zlib
+import zipfile
+import numpy as np
 import pygame
 import chess
 import chess.pgn
+import chess.polyglot
 import sqlite3
 import json
+import mmap
 import os
 import pyperclip
 import pygame_textinput
 import time
 import pickle
+import heapq
+import bisect
+import hashlib
+import operator
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
-from typing import List, Dict, Optional, Tuple, Protocol, Any
+from typing import List, Deque, Dict, Iterator, Optional, Tuple, Protocol, Any
 from pathlib import Path
-from collections import defaultdict  # <--- ADAUGĂ ACEASTĂ LINIE AICI
+from collections import Counter, OrderedDict, defaultdict, deque  # <--- ADAUGĂ ACEASTĂ LINIE AICI
 from concurrent.futures import ProcessPoolExecutor, as_completed
 from multiprocessing import cpu_count
-from functools import partial
+from functools import partial, lru_cache
+from itertools import chain, islice
 
 
 # Import tkinter with error handling
 try:
     from PySide6.QtWidgets import (QApplication, QWidget, QDialog, QPushButton, 
                                    QLabel, QLineEdit, QCheckBox, QProgressBar, 
-                                   QMessageBox, QFileDialog, QVBoxLayout, 
+                                   QMessageBox, QFileDialog, QVBoxLayout,
                                    QHBoxLayout, QGroupBox, QFrame, QScrollArea,
-                                   QSizePolicy)
-    from PySide6.QtCore import Qt, QSize
+                                   QSizePolicy, QProgressDialog)
+    from PySide6.QtCore import Qt, QSize, QObject, QThread, Signal
     QT_AVAILABLE = True
     print("[DEBUG INIT] PySide6 (Qt) imported successfully.")
 except ImportError:
@@ -44,29 +55,33 @@ def audit_database_for_checkmates(db_path="chess_traps.db"):
     
     try:
         conn = sqlite3.connect(db_path)
-        cursor = conn.execute("SELECT id, name, moves FROM traps")
-        all_traps = cursor.fetchall()
+        total_traps = conn.execute("SELECT COUNT(*) FROM traps").fetchone()[0]
+        print(f"Analyzing {total_traps} traps...")
+        try:
+            # Predicatul rulează în C, în SQLite (JSON1) - Python vede doar
+            # rândurile care pică auditul, nu toate capcanele
+            failed_rows = conn.execute("""
+                SELECT id, name, json_extract(moves, '$[#-1]') AS last_move FROM traps
+                WHERE last_move IS NULL OR last_move NOT LIKE '%#'
+            """).fetchall()
+        except sqlite3.OperationalError:
+            # JSON1 indisponibil - cădem înapoi pe verificarea în Python
+            failed_rows = []
+            for trap_id, name, moves_json in conn.execute("SELECT id, name, moves FROM traps"):
+                try:
+                    moves = json.loads(moves_json)
+                    if not moves or not moves[-1].endswith('#'):
+                        failed_rows.append((trap_id, name, moves[-1] if moves else None))
+                except Exception:
+                    failed_rows.append((trap_id, name, None))
         conn.close()
     except Exception as e:
         print(f"[AUDIT ERROR] Could not read from database: {e}")
         return
 
-    failed_traps = 0
-    total_traps = len(all_traps)
-    print(f"Analyzing {total_traps} traps...")
-
-    for trap_id, name, moves_json in all_traps:
-        try:
-            moves = json.loads(moves_json)
-            
-            # Verificăm dacă lista de mutări nu este goală și dacă ultima mutare se termină cu #
-            if not moves or not moves[-1].endswith('#'):
-                failed_traps += 1
-                print(f"[AUDIT FAILED] Trap '{name}' (ID: {trap_id}) does not end with '#'. Last move: {moves[-1] if moves else 'N/A'}")
-        
-        except Exception as e:
-            failed_traps += 1
-            print(f"[AUDIT FAILED] Could not parse moves for trap '{name}' (ID: {trap_id}). Error: {e}")
+    failed_traps = len(failed_rows)
+    for trap_id, name, last_move in failed_rows:
+        print(f"[AUDIT FAILED] Trap '{name}' (ID: {trap_id}) does not end with '#'. Last move: {last_move if last_move else 'N/A'}")
 
     print("\n--- AUDIT COMPLETE ---")
     if failed_traps == 0:
@@ -85,11 +100,16 @@ def audit_specific_line(line_to_check: List[str], db_path="chess_traps.db"):
     
     try:
         conn = sqlite3.connect(db_path)
-        # Folosim LIKE pentru a găsi potriviri la începutul string-ului JSON
-        # Notă: Asta poate fi lent pe baze de date foarte mari, dar e perfect pentru audit
+        # Căutăm pe interval (prefix range) în loc de LIKE, ca să folosim
+        # indexul B-tree de pe 'moves' (range scan, nu full table scan).
         json_prefix = json.dumps(line_to_check)[:-1] # Ex: '["e4", "e5"]' -> '["e4", "e5"'
-        
-        cursor = conn.execute("SELECT id, name, moves FROM traps WHERE moves LIKE ?", (f"{json_prefix}%",))
+
+        # Limita superioară clasică pentru prefix: ultimul byte incrementat
+        upper_bound = json_prefix[:-1] + chr(ord(json_prefix[-1]) + 1)
+        cursor = conn.execute(
+            "SELECT id, name, moves FROM traps WHERE moves >= ? AND moves < ?",
+            (json_prefix, upper_bound)
+        )
         matching_traps = cursor.fetchall()
         conn.close()
     except Exception as e:
@@ -156,6 +176,24 @@ SYSTEM_FINGERPRINTS: Dict[str, Any] = {
     }
 }
 
+# Amprentele de mai sus, precompilate ca bitboard-uri: per sistem, câte o
+# mască de pătrate obligatorii pentru fiecare tip de piesă. Verificarea
+# devine un AND pe int64 per tip de piesă, în loc de piece_at() per pătrat.
+_SYSTEM_FINGERPRINT_MASKS: Dict[chess.Color, Dict[str, Dict[int, int]]] = {
+    color: {
+        system_name: {
+            piece_type: sum(chess.BB_SQUARES[square] for square in squares)
+            for piece_type, squares in data["pieces"].items()
+        }
+        for system_name, data in systems.items()
+    }
+    for color, systems in SYSTEM_FINGERPRINTS.items()
+}
+
+# Tabel de ștergere pentru decorurile SAN (+ și #): str.translate face o
+# singură trecere în C în loc de două replace-uri per mutare
+_SAN_DECOR_TABLE = str.maketrans('', '', '+#')
+
 
 # --- NOUA CONFIGURAȚIE PENTRU 720p (1280x720) ---
 @dataclass
@@ -193,7 +231,7 @@ class UIConfig: # Numește-o direct UIConfig pentru a fi folosită
     SUGGESTION_PURPLE: Tuple[int, int, int] = (90, 60, 100) # Pentru queen hunter
 
 # --- NOU: Adaugă această clasă după `ChessTrap` ---
-@dataclass
+@dataclass(slots=True)
 class QueenTrap:
     """Represents a custom recorded trap (mat, queen hunt, etc.)."""
     name: str
@@ -203,18 +241,25 @@ class QueenTrap:
     capture_square: chess.Square
     created_at: Optional[str] = None # <-- ADAUGĂ SAU VERIFICĂ ACEASTĂ LINIE
     id: Optional[int] = None
+    moves_uci: Optional[str] = None  # UCI precomputat, doar pentru reconstruirea indexului
 
-@dataclass
+@dataclass(slots=True)
 class ChessTrap:
     """Represents a chess trap."""
     name: str
     moves: List[str]
     color: chess.Color
     id: Optional[int] = None
+    moves_uci: Optional[str] = None  # UCI precomputat, doar pentru reconstruirea indexului
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class MoveSuggestion:
-    """Represents a suggestion for a next move, aggregated from multiple traps."""
+    """Represents a suggestion for a next move, aggregated from multiple traps.
+
+    Slotted and frozen: instances are rebuilt on every suggestion-panel
+    refresh, so dropping the per-object __dict__ keeps them small and
+    attribute reads cheap in the sort.
+    """
     suggested_move: str
     trap_count: int
     example_trap_line: List[str]
@@ -234,7 +279,20 @@ class GameState:
     highlighted_squares: Optional[Tuple[chess.Square, chess.Square]] = None
     highlight_color: Optional[Tuple[int, int, int, int]] = None
     active_trap_line: Optional[List[str]] = None
+    # Aceeași linie cu +/# deja eliminate, ținută în paralel ca _make_move
+    # să nu mai curețe stringuri la fiecare mutare
+    active_trap_line_clean: Optional[List[str]] = None
     trap_success_message: Optional[str] = None # NOU: Mesaj de succes
+    # Zobrist-ul poziției curente, calculat leneș de zobrist() și anulat
+    # de controller la fiecare push/pop; toate cache-urile pe poziție
+    # partajează același int în loc să re-hash-uiască tabla
+    board_hash: Optional[int] = None
+
+    def zobrist(self) -> int:
+        """Return the cached Zobrist hash of the current position."""
+        if self.board_hash is None:
+            self.board_hash = chess.polyglot.zobrist_hash(self.board)
+        return self.board_hash
 
 
 # Repository Layer
@@ -244,14 +302,33 @@ class TrapRepository:
     
     def __init__(self, db_path: str = "chess_traps.db"):
         self.db_path = db_path
+        self._conn = _open_repo_connection(db_path)
+        # Lista completă de capcane, cache-uită între scrieri - auditul și
+        # serviciile o cer pe rând și altfel ar hidrata totul de două ori
+        self._all_traps_cache: Optional[List[ChessTrap]] = None
+        # COUNT(*)-ul total, cache-uit pe aceeași logică: doar scrierile
+        # prin repository pot schimba numărul de rânduri
+        self._count_cache: Optional[int] = None
         # --- MODIFICARE CRUCIALĂ ---
         # Apelăm migrarea direct la inițializare, înainte ca orice serviciu să citească datele.
         self._initialize_database()
+
+    def __getstate__(self):
+        # Conexiunea SQLite nu poate fi pickle-uită; worker-ii își deschid una nouă
+        state = self.__dict__.copy()
+        state['_conn'] = None
+        state['_all_traps_cache'] = None
+        state['_count_cache'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._conn = _open_repo_connection(self.db_path)
     
     def _initialize_database(self) -> None:
         """Initialize the database and perform a one-time migration if needed."""
         print("[DB MIGRATE] Checking database schema...")
-        with sqlite3.connect(self.db_path) as conn:
+        with self._conn as conn:
             cursor = conn.cursor()
             # Tabela pentru capcane de mat din PGN-uri (neschimbată)
             cursor.execute("""
@@ -260,7 +337,58 @@ class TrapRepository:
                     moves TEXT NOT NULL, color INTEGER NOT NULL,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )""")
-            
+
+            # Index pe 'moves' pentru căutările de prefix din audit (range scan)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_traps_moves ON traps(moves COLLATE BINARY)")
+
+            # --- MIGRARE: hash pe 'moves' pentru detectarea rapidă a duplicatelor ---
+            cursor.execute("PRAGMA table_info(traps)")
+            traps_columns = [info[1] for info in cursor.fetchall()]
+            if 'moves_hash' not in traps_columns:
+                print("[DB MIGRATE] Adding 'moves_hash' column to 'traps'...")
+                cursor.execute("ALTER TABLE traps ADD COLUMN moves_hash INTEGER")
+                rehash_needed = True
+            else:
+                # Backfill-ul istoric folosea crc32: 32 de biți, valori în
+                # [0, 2^32). La sute de mii de rânduri apar coliziuni reale,
+                # deci re-hash-uim cu varianta pe 64 de biți. Hash-urile noi
+                # (signed, pe toată plaja int64) nu pot fi TOATE în plaja
+                # crc32, deci testul distinge cele două formate.
+                cursor.execute("SELECT COUNT(*), "
+                               "SUM(moves_hash BETWEEN 0 AND 4294967295) "
+                               "FROM traps")
+                total, in_crc32_range = cursor.fetchone()
+                rehash_needed = bool(total) and in_crc32_range == total
+            if rehash_needed:
+                print("[DB MIGRATE] Back-filling 64-bit 'moves_hash' values...")
+                # Indexul UNIQUE (dacă există) ar putea respinge tranzitoriu
+                # un hash nou egal cu unul vechi încă ne-actualizat
+                cursor.execute("DROP INDEX IF EXISTS idx_traps_hash")
+                cursor.execute("SELECT id, moves FROM traps")
+                backfill = [(self._compute_moves_hash(moves_json), row_id)
+                            for row_id, moves_json in cursor.fetchall()]
+                if backfill:
+                    cursor.executemany("UPDATE traps SET moves_hash = ? WHERE id = ?", backfill)
+                # Eliminăm duplicatele existente, altfel indexul UNIQUE nu
+                # poate fi creat. Grupăm pe conținutul real, nu pe hash -
+                # două capcane diferite care colizionează pe hash nu trebuie
+                # să piardă una dintre ele.
+                cursor.execute("""
+                    DELETE FROM traps WHERE id NOT IN (
+                        SELECT MIN(id) FROM traps GROUP BY color, moves
+                    )""")
+            cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_traps_hash ON traps(color, moves_hash)")
+
+            # --- MIGRARE: UCI precomputat, ca rebuild-ul să evite parserul SAN ---
+            if 'moves_uci' not in traps_columns:
+                print("[DB MIGRATE] Adding 'moves_uci' column to 'traps' and back-filling...")
+                cursor.execute("ALTER TABLE traps ADD COLUMN moves_uci TEXT")
+                cursor.execute("SELECT id, moves FROM traps")
+                uci_backfill = [(_san_to_uci_string(json.loads(moves_json)), row_id)
+                                for row_id, moves_json in cursor.fetchall()]
+                if uci_backfill:
+                    cursor.executemany("UPDATE traps SET moves_uci = ? WHERE id = ?", uci_backfill)
+
             # Tabela pentru capcanele custom
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS queen_traps (
@@ -269,6 +397,17 @@ class TrapRepository:
                     capture_square INTEGER NOT NULL
                 )""")
 
+            # Tabele sidecar cu "urmele" FEN per capcană, ca reconstruirea
+            # indexului să nu mai re-parseze fiecare mutare SAN
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS trap_fens (
+                    trap_id INTEGER PRIMARY KEY, fens BLOB NOT NULL
+                )""")
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS queen_trap_fens (
+                    trap_id INTEGER PRIMARY KEY, fens BLOB NOT NULL
+                )""")
+
             # --- MIGRARE ONE-TIME (SIGURĂ) ---
             cursor.execute("PRAGMA table_info(queen_traps)")
             columns = [info[1] for info in cursor.fetchall()]
@@ -304,6 +443,16 @@ class TrapRepository:
                 cursor.execute("UPDATE queen_traps SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL")
                 migrated = True
                 
+            if 'moves_uci' not in columns:
+                print("[DB MIGRATE] Adding 'moves_uci' column to 'queen_traps' and back-filling...")
+                cursor.execute("ALTER TABLE queen_traps ADD COLUMN moves_uci TEXT")
+                cursor.execute("SELECT id, moves FROM queen_traps")
+                uci_backfill = [(_san_to_uci_string(json.loads(moves_json)), row_id)
+                                for row_id, moves_json in cursor.fetchall()]
+                if uci_backfill:
+                    cursor.executemany("UPDATE queen_traps SET moves_uci = ? WHERE id = ?", uci_backfill)
+                migrated = True
+
             if migrated:
                 print("[DB MIGRATE] Database migration complete.")
             
@@ -313,97 +462,234 @@ class TrapRepository:
     # ... restul metodelor din TrapRepository (save_trap, get_all_traps, etc.) rămân neschimbate ...
     # (codul lor de mai jos nu trebuie modificat)
 
+    @staticmethod
+    def _compute_moves_hash(moves_json: str) -> int:
+        """Fixed-width hash for the JSON move list, used by the UNIQUE index.
+
+        64 de biți (signed, ca să încapă în INTEGER-ul SQLite): la sute de
+        mii de capcane, crc32 pe 32 de biți producea coliziuni reale și
+        INSERT OR IGNORE arunca pe tăcute capcane distincte.
+        """
+        digest = hashlib.blake2b(moves_json.encode('utf-8'), digest_size=8).digest()
+        return int.from_bytes(digest, 'big', signed=True)
+
     def save_trap(self, trap: ChessTrap) -> int:
         """Saves a single checkmate trap (used by PGN import)."""
-        with sqlite3.connect(self.db_path) as conn:
+        moves_json = json.dumps(trap.moves)
+        with self._conn as conn:
             cursor = conn.execute(
-                "INSERT INTO traps (name, moves, color) VALUES (?, ?, ?)",
-                (trap.name, json.dumps(trap.moves), int(trap.color))
+                "INSERT OR IGNORE INTO traps (name, moves, color, moves_hash, moves_uci) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (trap.name, moves_json, int(trap.color),
+                 self._compute_moves_hash(moves_json), _san_to_uci_string(trap.moves))
             )
             conn.commit()
-            # Asigură-te că aceasta este ultima linie din funcție și că nu urmează nimic după ea.
-            return cursor.lastrowid
+            # rowcount == 0 înseamnă duplicat (INSERT-ul a fost ignorat)
+            if cursor.rowcount:
+                self._invalidate_traps_cache()
+            return cursor.lastrowid if cursor.rowcount else -1
 
     def get_all_traps(self) -> List[ChessTrap]:
-        """Gets ALL checkmate traps from the database."""
+        """Gets ALL checkmate traps, from cache if nothing was written since."""
+        if self._all_traps_cache is not None:
+            # Copie superficială: apelanții pot adăuga/șterge din lista lor
+            return list(self._all_traps_cache)
         traps = []
         print("[DB PGN] Reading all traps from 'traps' table...")
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._conn as conn:
                 # Fără LIMIT, fără condiții, citim tot.
-                cursor = conn.execute("SELECT id, name, moves, color FROM traps")
+                cursor = conn.execute("SELECT id, name, moves, color, moves_uci FROM traps")
                 for row in cursor.fetchall():
-                    trap_id, name, moves_json, color = row
-                    moves = json.loads(moves_json)
+                    trap_id, name, moves_json, color, moves_uci = row
+                    moves = _load_moves(moves_json)
                     traps.append(ChessTrap(
-                        id=trap_id, 
-                        name=name, 
-                        moves=moves, 
-                        color=bool(color)
+                        id=trap_id,
+                        name=name,
+                        moves=moves,
+                        color=bool(color),
+                        moves_uci=moves_uci
                     ))
             print(f"[DB PGN] Successfully loaded {len(traps)} traps.")
+            self._all_traps_cache = traps
         except sqlite3.Error as e:
             print(f"[DB PGN ERROR] Could not read traps: {e}")
-        return traps
-    
+        return list(traps)
+
+    def _invalidate_traps_cache(self) -> None:
+        self._all_traps_cache = None
+        self._count_cache = None
+
     def get_total_trap_count(self) -> int:
-        """Get total number of traps in database."""
+        """Get total number of traps in database, cached between writes."""
+        if self._count_cache is not None:
+            return self._count_cache
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._conn as conn:
                 cursor = conn.execute("SELECT COUNT(*) FROM traps")
-                return cursor.fetchone()[0]
+                self._count_cache = cursor.fetchone()[0]
+                return self._count_cache
         except sqlite3.Error:
             return 0
+
+    def get_trap_by_id(self, trap_id: int) -> Optional[ChessTrap]:
+        """Fetches a single trap row; returns None if it does not exist."""
+        try:
+            with self._conn as conn:
+                cursor = conn.execute(
+                    "SELECT id, name, moves, color FROM traps WHERE id = ?", (trap_id,))
+                row = cursor.fetchone()
+        except sqlite3.Error as e:
+            print(f"[DB ERROR] Could not fetch trap {trap_id}: {e}")
+            return None
+        if row is None:
+            return None
+        return ChessTrap(id=row[0], name=row[1], moves=_load_moves(row[2]), color=bool(row[3]))
+
+    def get_trap_stats(self) -> Tuple[int, int, int]:
+        """Returns (count, id_sum, max_id) in one aggregate query.
+
+        Cheap fingerprint of the table used to validate the index cache
+        without materializing any ChessTrap objects.
+        """
+        try:
+            with self._conn as conn:
+                cursor = conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(id), 0), COALESCE(MAX(id), 0) FROM traps")
+                count, id_sum, max_id = cursor.fetchone()
+                return count, id_sum, max_id
+        except sqlite3.Error:
+            return 0, 0, 0
             
     def import_traps(self, traps: List[ChessTrap]) -> int:
-        """Import multiple traps, avoiding duplicates."""
-        imported_count = 0
-        
-        with sqlite3.connect(self.db_path) as conn:
-            for trap in traps:
-                # Check for duplicates (same color and moves)
-                cursor = conn.execute(
-                    "SELECT id FROM traps WHERE color = ? AND moves = ?",
-                    (int(trap.color), json.dumps(trap.moves))
-                )
-                
-                if not cursor.fetchone():  # No duplicate found
-                    trap_id = self.save_trap(trap)
-                    imported_count += 1
-                    print(f"[DEBUG DB] Salvat: {trap.name} (ID: {trap_id})")
-                else:
-                    print(f"[DEBUG DB] Duplicat găsit, sărim: {trap.name}")
-        
+        """Import multiple traps in one batched transaction, avoiding duplicates.
+
+        Duplicates are rejected by the UNIQUE(color, moves_hash) index via
+        INSERT OR IGNORE, so no per-trap SELECT round-trip is needed.
+        """
+        if not traps:
+            return 0
+
+        with self._conn as conn:
+            imported_count = self._insert_trap_rows(conn, traps)
+
+        if imported_count:
+            self._invalidate_traps_cache()
+        skipped = len(traps) - imported_count
+        print(f"[DEBUG DB] Batch import: {imported_count} salvate, {skipped} duplicate sărite.")
         return imported_count
 
+    def import_traps_pair(self, white_traps: List[ChessTrap],
+                          black_traps: List[ChessTrap]) -> Tuple[int, int, List[int]]:
+        """Import both color batches under one transaction (one fsync),
+        keeping the per-color imported counts the callers report.
+
+        Also returns the ids of the newly inserted rows, so callers can
+        patch in-memory indexes with just the delta instead of reloading
+        the whole table. Ids are AUTOINCREMENT, so everything above the
+        pre-insert MAX(id) is exactly what this call added.
+        """
+        if not white_traps and not black_traps:
+            return 0, 0, []
+
+        with self._conn as conn:
+            prev_max_id = conn.execute(
+                "SELECT COALESCE(MAX(id), 0) FROM traps").fetchone()[0]
+            white_imported = self._insert_trap_rows(conn, white_traps)
+            black_imported = self._insert_trap_rows(conn, black_traps)
+            added_ids = [row[0] for row in conn.execute(
+                "SELECT id FROM traps WHERE id > ?", (prev_max_id,))]
+
+        if white_imported or black_imported:
+            self._invalidate_traps_cache()
+        skipped = len(white_traps) + len(black_traps) - white_imported - black_imported
+        print(f"[DEBUG DB] Batch import: {white_imported + black_imported} salvate, "
+              f"{skipped} duplicate sărite.")
+        return white_imported, black_imported, added_ids
+
+    def _insert_trap_rows(self, conn: sqlite3.Connection, traps: List[ChessTrap]) -> int:
+        """Inserts a batch of traps with executemany; returns how many stuck."""
+        if not traps:
+            return 0
+        rows = []
+        for trap in traps:
+            moves_json = json.dumps(trap.moves)
+            rows.append((trap.name, moves_json, int(trap.color),
+                         self._compute_moves_hash(moves_json),
+                         _san_to_uci_string(trap.moves)))
+        cursor = conn.executemany(
+            "INSERT OR IGNORE INTO traps (name, moves, color, moves_hash, moves_uci) "
+            "VALUES (?, ?, ?, ?, ?)",
+            rows
+        )
+        return cursor.rowcount
+
+    # --- METODE PENTRU CACHE-UL DE URME FEN ---
+
+    def get_fen_traces(self) -> Dict[int, List[int]]:
+        """Loads all cached key traces (trap_id -> Zobrist key after each move)."""
+        traces = {}
+        try:
+            with self._conn as conn:
+                cursor = conn.execute("SELECT trap_id, fens FROM trap_fens")
+                for trap_id, blob in cursor.fetchall():
+                    try:
+                        traces[trap_id] = pickle.loads(blob)
+                    except Exception:
+                        continue  # Blob corupt - va fi recalculat
+        except sqlite3.Error as e:
+            print(f"[DB ERROR] Could not read FEN traces: {e}")
+        return traces
+
+    def save_fen_traces(self, traces: Dict[int, List[int]]) -> None:
+        """Persists key traces so future index rebuilds skip the move replay."""
+        if not traces:
+            return
+        rows = [(trap_id, pickle.dumps(fens, protocol=pickle.HIGHEST_PROTOCOL))
+                for trap_id, fens in traces.items()]
+        with self._conn as conn:
+            conn.executemany("INSERT OR REPLACE INTO trap_fens (trap_id, fens) VALUES (?, ?)", rows)
+            conn.commit()
+
     # --- METODE NOI PENTRU AUDIT ---
-    
+
     def delete_traps_by_ids(self, ids: List[int]):
         """Deletes multiple traps from the database in a single transaction."""
         if not ids:
             return
-        with sqlite3.connect(self.db_path) as conn:
+        with self._conn as conn:
             # Create a placeholder string like (?, ?, ?) for the number of IDs
             placeholders = ', '.join('?' for _ in ids)
-            query = f"DELETE FROM traps WHERE id IN ({placeholders})"
-            conn.execute(query, ids)
+            conn.execute(f"DELETE FROM traps WHERE id IN ({placeholders})", ids)
+            # Ștergem și urmele FEN asociate, ca să nu rămână orfane
+            conn.execute(f"DELETE FROM trap_fens WHERE trap_id IN ({placeholders})", ids)
             conn.commit()
-            
+        self._invalidate_traps_cache()
+
     def update_trap_colors(self, updates: List[Tuple[bool, int]]):
         """Batch updates the color of multiple traps."""
         if not updates:
             return
         # `updates` is a list of (new_color, trap_id)
-        with sqlite3.connect(self.db_path) as conn:
+        with self._conn as conn:
             conn.executemany("UPDATE traps SET color = ? WHERE id = ?", updates)
             conn.commit()
+        self._invalidate_traps_cache()
+
+    def clear_all_traps(self) -> None:
+        """Deletes every trap and its cached FEN trace."""
+        with self._conn as conn:
+            conn.execute("DELETE FROM traps")
+            conn.execute("DELETE FROM trap_fens")
+            conn.commit()
+        self._invalidate_traps_cache()
 
     def get_trap_counts_by_color(self) -> Tuple[int, int]:
         """Returns the number of traps for White and Black."""
         white_count = 0
         black_count = 0
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._conn as conn:
                 # chess.WHITE este True (1), chess.BLACK este False (0)
                 cursor = conn.execute("SELECT color, COUNT(*) FROM traps GROUP BY color")
                 for color, count in cursor.fetchall():
@@ -421,10 +707,24 @@ class QueenTrapRepository:
     def __init__(self, db_path: str = "chess_traps.db"):
         self.db_path = db_path
         # Initializarea este deja făcută de TrapRepository, nu mai e nevoie aici
+        self._conn = _open_repo_connection(db_path)
+        # COUNT(*)-ul total, invalidat de orice scriere prin repository
+        self._count_cache: Optional[int] = None
+
+    def __getstate__(self):
+        # Conexiunea SQLite nu poate fi pickle-uită; worker-ii își deschid una nouă
+        state = self.__dict__.copy()
+        state['_conn'] = None
+        state['_count_cache'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._conn = _open_repo_connection(self.db_path)
 
     def save_trap(self, trap: QueenTrap) -> int:
         """Save a queen trap to the database and return its ID."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._conn as conn:
             cursor = conn.execute(
                 "SELECT id FROM queen_traps WHERE moves = ? AND color = ?",
                 (json.dumps(trap.moves), int(trap.color))
@@ -434,20 +734,23 @@ class QueenTrapRepository:
                 return -1
 
         # --- MODIFICARE AICI: Folosim 'localtime' pentru a ajusta fusul orar ---
-        with sqlite3.connect(self.db_path) as conn:
+        with self._conn as conn:
             cursor = conn.execute(
-                "INSERT INTO queen_traps (name, trap_type, moves, color, capture_square, created_at) VALUES (?, ?, ?, ?, ?, datetime('now', 'localtime'))",
-                (trap.name, trap.trap_type, json.dumps(trap.moves), int(trap.color), trap.capture_square)
+                "INSERT INTO queen_traps (name, trap_type, moves, color, capture_square, moves_uci, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, datetime('now', 'localtime'))",
+                (trap.name, trap.trap_type, json.dumps(trap.moves), int(trap.color),
+                 trap.capture_square, _san_to_uci_string(trap.moves))
             )
             conn.commit()
+            self._count_cache = None
             return cursor.lastrowid
 
     def get_all_traps(self) -> List[QueenTrap]:
         traps = []
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._conn as conn:
                 cursor = conn.cursor()
-                cursor.execute("SELECT id, name, trap_type, moves, color, capture_square, created_at FROM queen_traps")
+                cursor.execute("SELECT id, name, trap_type, moves, color, capture_square, created_at, moves_uci FROM queen_traps")
                 
                 print("\n[DEBUG DB QUEEN] Reading all custom traps from database:")
                 all_rows = cursor.fetchall()
@@ -456,8 +759,8 @@ class QueenTrapRepository:
                     # Afișăm rândul brut pentru debug
                     print(f"  - Raw DB Row: {row}")
                     
-                    trap_id, name, trap_type, moves_json, color, capture_square, created_at = row
-                    moves = json.loads(moves_json)
+                    trap_id, name, trap_type, moves_json, color, capture_square, created_at, moves_uci = row
+                    moves = _load_moves(moves_json)
                     
                     traps.append(QueenTrap(
                         id=trap_id, 
@@ -466,7 +769,8 @@ class QueenTrapRepository:
                         moves=moves, 
                         color=bool(color), 
                         capture_square=int(capture_square),
-                        created_at=created_at
+                        created_at=created_at,
+                        moves_uci=moves_uci
                     ))
                 print("[DEBUG DB QUEEN] Finished reading.\n")
 
@@ -474,405 +778,950 @@ class QueenTrapRepository:
             print(f"[DB QUEEN ERROR] Could not read queen traps: {e}")
         return traps
             
+    def get_fen_traces(self) -> Dict[int, List[int]]:
+        """Loads all cached Zobrist key traces for custom traps."""
+        traces = {}
+        try:
+            with self._conn as conn:
+                cursor = conn.execute("SELECT trap_id, fens FROM queen_trap_fens")
+                for trap_id, blob in cursor.fetchall():
+                    try:
+                        traces[trap_id] = pickle.loads(blob)
+                    except Exception:
+                        continue  # Blob corupt - va fi recalculat
+        except sqlite3.Error as e:
+            print(f"[DB QUEEN ERROR] Could not read FEN traces: {e}")
+        return traces
+
+    def save_fen_traces(self, traces: Dict[int, List[int]]) -> None:
+        """Persists key traces so future index rebuilds skip the move replay."""
+        if not traces:
+            return
+        rows = [(trap_id, pickle.dumps(fens, protocol=pickle.HIGHEST_PROTOCOL))
+                for trap_id, fens in traces.items()]
+        with self._conn as conn:
+            conn.executemany("INSERT OR REPLACE INTO queen_trap_fens (trap_id, fens) VALUES (?, ?)", rows)
+            conn.commit()
+
     def delete_trap_by_id(self, trap_id: int) -> None:
         """Deletes a specific queen trap by its ID."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._conn as conn:
             conn.execute("DELETE FROM queen_traps WHERE id = ?", (trap_id,))
+            conn.execute("DELETE FROM queen_trap_fens WHERE trap_id = ?", (trap_id,))
             conn.commit()
+        self._count_cache = None
 
     def get_total_trap_count(self) -> int:
-        """Get total number of custom traps (queen traps table) in database."""
+        """Get total number of custom traps, cached between writes."""
+        if self._count_cache is not None:
+            return self._count_cache
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._conn as conn:
                 cursor = conn.execute("SELECT COUNT(*) FROM queen_traps")
+                self._count_cache = cursor.fetchone()[0]
+                return self._count_cache
+        except sqlite3.Error:
+            return 0
+
+    def count_traps_by_type(self, trap_type: str) -> int:
+        """Counts custom traps of one type, without materializing any rows."""
+        try:
+            with self._conn as conn:
+                cursor = conn.execute(
+                    "SELECT COUNT(*) FROM queen_traps WHERE trap_type = ?", (trap_type,))
                 return cursor.fetchone()[0]
         except sqlite3.Error:
             return 0
 
+    def get_trap_by_id(self, trap_id: int) -> Optional[QueenTrap]:
+        """Fetches a single custom trap row; returns None if it does not exist."""
+        try:
+            with self._conn as conn:
+                cursor = conn.execute(
+                    "SELECT id, name, trap_type, moves, color, capture_square, created_at "
+                    "FROM queen_traps WHERE id = ?", (trap_id,))
+                row = cursor.fetchone()
+        except sqlite3.Error as e:
+            print(f"[DB QUEEN ERROR] Could not fetch trap {trap_id}: {e}")
+            return None
+        if row is None:
+            return None
+        return QueenTrap(id=row[0], name=row[1], trap_type=row[2],
+                         moves=_load_moves(row[3]), color=bool(row[4]),
+                         capture_square=int(row[5]), created_at=row[6])
+
+    def get_trap_stats(self) -> Tuple[int, int, int]:
+        """Returns (count, id_sum, max_id) in one aggregate query."""
+        try:
+            with self._conn as conn:
+                cursor = conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(id), 0), COALESCE(MAX(id), 0) FROM queen_traps")
+                count, id_sum, max_id = cursor.fetchone()
+                return count, id_sum, max_id
+        except sqlite3.Error:
+            return 0, 0, 0
+
     def delete_checkmate_traps(self) -> int:
         """Deletes all manually recorded checkmates from the queen_traps table.
         
         Returns:
             The number of rows deleted.
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self._conn as conn:
             cursor = conn.execute("DELETE FROM queen_traps WHERE trap_type = 'Checkmate'")
+            conn.execute("""
+                DELETE FROM queen_trap_fens WHERE trap_id NOT IN (
+                    SELECT id FROM queen_traps
+                )""")
             conn.commit()
             deleted_count = cursor.rowcount
-            print(f"[DB QUEEN] Deleted {deleted_count} custom checkmate traps.")
-            return deleted_count
+        self._count_cache = None
+        print(f"[DB QUEEN] Deleted {deleted_count} custom checkmate traps.")
+        return deleted_count
 
 # Service Layer
-class TrapService:
+
+class PositionIndexSoA:
+    """Structure-of-arrays layout for the position index.
+
+    Keeps the Zobrist keys sorted in one contiguous uint64 array with
+    CSR-style offsets into parallel trap_id / move_index arrays, so a
+    lookup is one binary search plus a slice instead of three levels of
+    Python object indirection. Traps added after the build land in a small
+    dict overlay that is consulted alongside the arrays.
     """
-    Service for managing trap logic and suggestions using position-based indexing
-    with on-disk caching for fast startup.
+
+    TYPE_NAMES = ('checkmate', 'queen_hunter')
+
+    def __init__(self, keys: "np.ndarray", offsets: "np.ndarray",
+                 trap_ids: "np.ndarray", move_indices: "np.ndarray",
+                 colors: "np.ndarray", next_move_ids: "np.ndarray",
+                 type_ids: "np.ndarray", vocab: List[str]):
+        self.keys = keys
+        self.offsets = offsets
+        self.trap_ids = trap_ids
+        self.move_indices = move_indices
+        self.colors = colors
+        # "Următoarea mutare a capcanei" per intrare, ca id în vocabularul
+        # SAN (-1 = linia se termină aici) - sugestiile nu mai ating rândurile
+        self.next_move_ids = next_move_ids
+        self.type_ids = type_ids
+        self.vocab = vocab
+        self._overlay: Dict[int, List[Tuple[int, int, int, Optional[str], int]]] = defaultdict(list)
+
+    @classmethod
+    def from_dict(cls, index: Dict[int, List[Tuple[int, int, int, Optional[str], int]]]) -> "PositionIndexSoA":
+        """Flattens a {key: [(trap_id, move_index, color, next_san, type_id), ...]} dict into arrays."""
+        sorted_keys = sorted(index)
+        keys = np.fromiter(sorted_keys, dtype=np.uint64, count=len(sorted_keys))
+        offsets = np.zeros(len(sorted_keys) + 1, dtype=np.int64)
+        trap_ids_flat: List[int] = []
+        move_indices_flat: List[int] = []
+        colors_flat: List[int] = []
+        next_ids_flat: List[int] = []
+        type_ids_flat: List[int] = []
+        vocab: List[str] = []
+        vocab_ids: Dict[str, int] = {}
+        for i, key in enumerate(sorted_keys):
+            entries = index[key]
+            offsets[i + 1] = offsets[i] + len(entries)
+            for trap_id, move_index, color, next_san, type_id in entries:
+                trap_ids_flat.append(trap_id)
+                move_indices_flat.append(move_index)
+                colors_flat.append(color)
+                if next_san is None:
+                    next_ids_flat.append(-1)
+                else:
+                    next_id = vocab_ids.get(next_san)
+                    if next_id is None:
+                        next_id = vocab_ids[next_san] = len(vocab)
+                        vocab.append(next_san)
+                    next_ids_flat.append(next_id)
+                type_ids_flat.append(type_id)
+        return cls(keys, offsets,
+                   np.asarray(trap_ids_flat, dtype=np.int32),
+                   np.asarray(move_indices_flat, dtype=np.int16),
+                   np.asarray(colors_flat, dtype=np.uint8),
+                   np.asarray(next_ids_flat, dtype=np.int32),
+                   np.asarray(type_ids_flat, dtype=np.uint8),
+                   vocab)
+
+    def _find_key(self, key: int) -> Tuple[int, int]:
+        """Returns the (lo, hi) slice bounds for a key, or (0, 0) if absent."""
+        i = int(np.searchsorted(self.keys, np.uint64(key)))
+        if i < len(self.keys) and self.keys[i] == np.uint64(key):
+            return int(self.offsets[i]), int(self.offsets[i + 1])
+        return 0, 0
+
+    def count(self, key: int, color: Optional[int] = None) -> int:
+        """Counts the entries for a position key without building any tuples."""
+        lo, hi = self._find_key(key)
+        n = 0
+        if hi > lo:
+            if color is None:
+                n = hi - lo
+            else:
+                n = int((self.colors[lo:hi] == color).sum())
+        if self._overlay:
+            n += sum(1 for _tid, _mi, c, _nsan, _tix in self._overlay.get(key, [])
+                     if color is None or c == color)
+        return n
+
+    def count_first_moves(self, color: int) -> int:
+        """Counts traps of one color via their move-0 entries (one per trap)."""
+        n = int(((self.move_indices == 0) & (self.colors == color)).sum())
+        if self._overlay:
+            n += sum(1 for entries in self._overlay.values()
+                     for _tid, mi, c, _nsan, _tix in entries if mi == 0 and c == color)
+        return n
+
+    def next_move_counts(self, key: int, color: Optional[int] = None
+                         ) -> Dict[Tuple[str, str], Tuple[int, int, int]]:
+        """Aggregates "our next move" for a position key, entirely in C.
+
+        Returns {(next_san, type_name): (count, example_trap_id,
+        example_move_index)}. Only entries where the trap owner is to
+        move are counted - the parity test the Python loop used to run
+        per match is a single vectorized mask here.
+        """
+        groups: Dict[Tuple[str, str], Tuple[int, int, int]] = {}
+        lo, hi = self._find_key(key)
+        if hi > lo:
+            next_ids = self.next_move_ids[lo:hi]
+            move_indices = self.move_indices[lo:hi]
+            colors = self.colors[lo:hi]
+            mask = (next_ids >= 0) & (((move_indices + 1) & 1) == (1 - colors))
+            if color is not None:
+                mask &= colors == color
+            sel = np.nonzero(mask)[0]
+            if sel.size:
+                combo = (next_ids[sel].astype(np.int64) << 1) | self.type_ids[lo:hi][sel]
+                uniq, first, counts = np.unique(combo, return_index=True, return_counts=True)
+                trap_ids = self.trap_ids[lo:hi]
+                for u, f, n in zip(uniq.tolist(), first.tolist(), counts.tolist()):
+                    j = int(sel[f])
+                    groups[(self.vocab[u >> 1], self.TYPE_NAMES[u & 1])] = (
+                        n, int(trap_ids[j]), int(move_indices[j]))
+        for tid, mi, c, next_san, type_id in self._overlay.get(key, []):
+            if next_san is None or (mi + 1) % 2 != 1 - c:
+                continue
+            if color is not None and c != color:
+                continue
+            group_key = (next_san, self.TYPE_NAMES[type_id])
+            prev = groups.get(group_key)
+            groups[group_key] = (prev[0] + 1, prev[1], prev[2]) if prev else (1, tid, mi)
+        return groups
+
+    def most_common_next(self, key: int) -> Optional[str]:
+        """Most frequent continuation after this position, across all traps."""
+        counts: Counter = Counter()
+        lo, hi = self._find_key(key)
+        if hi > lo:
+            next_ids = self.next_move_ids[lo:hi]
+            uniq, n = np.unique(next_ids[next_ids >= 0], return_counts=True)
+            for u, c in zip(uniq.tolist(), n.tolist()):
+                counts[self.vocab[u]] = c
+        for _tid, _mi, _c, next_san, _tix in self._overlay.get(key, []):
+            if next_san is not None:
+                counts[next_san] += 1
+        # most_common(1) rulează selecția în C, fără dict.get per intrare
+        return counts.most_common(1)[0][0] if counts else None
+
+    def add_entry(self, key: int, trap_id: int, move_index: int, color: int,
+                  next_san: Optional[str] = None, type_id: int = 0) -> None:
+        """Records a dynamically added trap without rebuilding the arrays."""
+        self._overlay[key].append((trap_id, move_index, color, next_san, type_id))
+
+    def remove_traps(self, removed_ids) -> None:
+        """Drops every entry belonging to the given trap ids.
+
+        One vectorized isin mask over the entry columns plus a rebuild of
+        the keys/offsets pair from the surviving entries - O(entries), no
+        replay of any trap line.
+        """
+        removed = np.asarray(list(removed_ids), dtype=self.trap_ids.dtype)
+        keep = ~np.isin(self.trap_ids, removed)
+        if not keep.all():
+            # Cheia fiecărei intrări, expandată din layout-ul CSR
+            entry_keys = np.repeat(self.keys, np.diff(self.offsets))[keep]
+            self.trap_ids = self.trap_ids[keep]
+            self.move_indices = self.move_indices[keep]
+            self.colors = self.colors[keep]
+            self.next_move_ids = self.next_move_ids[keep]
+            self.type_ids = self.type_ids[keep]
+            self.keys, kept_counts = np.unique(entry_keys, return_counts=True)
+            offsets = np.zeros(len(self.keys) + 1, dtype=np.int64)
+            np.cumsum(kept_counts, out=offsets[1:])
+            self.offsets = offsets
+        if self._overlay:
+            removed_set = {int(trap_id) for trap_id in removed_ids}
+            for key in list(self._overlay):
+                entries = [e for e in self._overlay[key] if e[0] not in removed_set]
+                if entries:
+                    self._overlay[key] = entries
+                else:
+                    del self._overlay[key]
+
+    def update_colors(self, color_updates) -> None:
+        """Rewrites the color column for (color, trap_id) pairs in place."""
+        if not color_updates:
+            return
+        # Apărare: dacă coloana ar veni vreodată dintr-o sursă read-only
+        # (ex. un .npy mapat), o copiem la prima scriere
+        if not self.colors.flags.writeable:
+            self.colors = np.array(self.colors)
+        for color, trap_id in color_updates:
+            self.colors[self.trap_ids == trap_id] = int(color)
+        if self._overlay:
+            new_colors = {int(trap_id): int(color) for color, trap_id in color_updates}
+            for key, entries in self._overlay.items():
+                self._overlay[key] = [
+                    (tid, mi, new_colors.get(tid, c), nsan, tix)
+                    for tid, mi, c, nsan, tix in entries]
+
+    def compact(self) -> None:
+        """Folds the overlay dict back into the sorted arrays.
+
+        Needed before the index is persisted: the cache file stores only
+        the arrays, so overlay entries would silently vanish on the next
+        load. A stable argsort merge keeps everything O(entries log entries).
+        """
+        if not self._overlay:
+            return
+        overlay_keys: List[int] = []
+        overlay_cols: Tuple[List[int], ...] = ([], [], [], [], [])
+        vocab_ids = {san: i for i, san in enumerate(self.vocab)}
+        for key, entries in self._overlay.items():
+            for trap_id, move_index, color, next_san, type_id in entries:
+                if next_san is None:
+                    next_id = -1
+                else:
+                    next_id = vocab_ids.get(next_san)
+                    if next_id is None:
+                        next_id = vocab_ids[next_san] = len(self.vocab)
+                        self.vocab.append(next_san)
+                overlay_keys.append(key)
+                for col, value in zip(overlay_cols,
+                                      (trap_id, move_index, color, next_id, type_id)):
+                    col.append(value)
+        entry_keys = np.concatenate([
+            np.repeat(self.keys, np.diff(self.offsets)),
+            np.asarray(overlay_keys, dtype=np.uint64)])
+        order = np.argsort(entry_keys, kind='stable')
+        for name, extra in zip(('trap_ids', 'move_indices', 'colors',
+                                'next_move_ids', 'type_ids'), overlay_cols):
+            old = getattr(self, name)
+            setattr(self, name, np.concatenate(
+                [old, np.asarray(extra, dtype=old.dtype)])[order])
+        self.keys, merged_counts = np.unique(entry_keys[order], return_counts=True)
+        offsets = np.zeros(len(self.keys) + 1, dtype=np.int64)
+        np.cumsum(merged_counts, out=offsets[1:])
+        self.offsets = offsets
+        self._overlay.clear()
+
+    def __len__(self) -> int:
+        return len(self.keys) + len(self._overlay)
+
+
+def _open_repo_connection(db_path: str) -> sqlite3.Connection:
+    """Opens the long-lived connection shared by a repository instance.
+
+    One connection per repository instead of one per call: connect() pays
+    for a file open and schema parse every time, which the import loops
+    feel. WAL lets the audit thread keep reading while the app writes,
+    and synchronous=NORMAL halves the fsync traffic.
     """
-    
-    # Definim calea către fișierul de cache
-    CACHE_FILE_PATH = "trap_index.cache"
-    
-    def __init__(self, repository: TrapRepository):
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    conn.executescript(
+        "PRAGMA journal_mode=WAL;"
+        "PRAGMA synchronous=NORMAL;"
+        "PRAGMA cache_size=-65536;"
+        "PRAGMA temp_store=MEMORY;")
+    return conn
+
+
+def _san_to_uci_string(moves: List[str]) -> Optional[str]:
+    """Replays a SAN line once and returns the space-joined UCI string.
+
+    SAN parsing needs legal-move generation plus disambiguation on every
+    move; storing the UCI at save time lets index rebuilds push moves
+    directly. Returns None when the line cannot be replayed - callers
+    store NULL and the rebuild falls back to the SAN parser.
+    """
+    board = chess.Board()
+    ucis = []
+    try:
+        for move_san in moves:
+            move = board.parse_san(move_san.replace('#', '').replace('+', ''))
+            ucis.append(move.uci())
+            board.push(move)
+    except ValueError:
+        return None
+    return ' '.join(ucis)
+
+
+def _load_moves(moves_json: str) -> Tuple[str, ...]:
+    """Deserializes a stored move list as a tuple of interned SAN tokens.
+
+    Tuples keep loaded lines immutable, and the continuation slices the
+    suggestion path takes from them are plain pointer copies.
+
+    The canonical shape produced by json.dumps - '["e4", "e5", ...]' -
+    is decoded with a plain slice + split instead of the json module;
+    SAN tokens never contain quotes or backslashes, so the two are
+    equivalent and the split is several times cheaper. Anything else
+    falls back to json.loads.
+
+    Thousands of traps share the same handful of opening moves ("e4",
+    "Nf3", ...); interning makes every reference point at one shared str
+    object, so dict lookups in the index and opening book hit the fast identity
+    path and the pickled cache stays small.
+    """
+    if (moves_json.startswith('["') and moves_json.endswith('"]')
+            and '\\' not in moves_json and '","' not in moves_json):
+        return tuple(sys.intern(m) for m in moves_json[2:-2].split('", "'))
+    return tuple(sys.intern(m) for m in json.loads(moves_json))
+
+
+def _format_thousands(n: int) -> str:
+    """1234567 -> '1 234 567' - gruparea cu spații folosită peste tot în UI."""
+    return f"{n:_}".replace("_", " ")
+
+
+# Agregatele de deschidere per culoare: {(primul_san, trap_type): (count,
+# linie_exemplu)}. Singurul cititor este ramura de poziție inițială din
+# get_aggregated_suggestions, care nu coboară sub prima mutare - deci doar
+# primul nivel se păstrează, nu un trie pe toată linia (care la sute de mii
+# de capcane ar însemna milioane de noduri și un pickle imens în cache).
+OpeningBook = Dict[Tuple[str, str], Tuple[int, List[str]]]
+
+
+def _bump_opening_entry(book: OpeningBook, moves: List[str], trap_type: str) -> None:
+    """Adds one trap line to a color's first-move aggregates."""
+    key = (moves[0], trap_type)
+    entry = book.get(key)
+    if entry is None:
+        book[key] = (1, moves)
+    else:
+        book[key] = (entry[0] + 1, entry[1])
+
+
+def _build_opening_books(traps) -> Dict[int, OpeningBook]:
+    """Builds the per-color first-move aggregates from the given traps."""
+    books: Dict[int, OpeningBook] = {int(chess.WHITE): {}, int(chess.BLACK): {}}
+    for trap in traps:
+        if not trap.moves:
+            continue
+        trap_type = 'checkmate'
+        if isinstance(trap, QueenTrap):
+            trap_type = 'checkmate' if 'Checkmate' in trap.trap_type else 'queen_hunter'
+        _bump_opening_entry(books[int(trap.color)], trap.moves, trap_type)
+    return books
+
+
+def _replay_fen_traces_chunk(trap_entries: List[Tuple[int, List[str], Optional[str]]]) -> Dict[int, List[int]]:
+    """Replays the moves for a slice of traps and returns the Zobrist key trace per trap.
+
+    Traps with a stored UCI line are replayed via Move.from_uci + push,
+    skipping SAN parsing (and its legal-move generation) entirely; rows
+    without one fall back to the SAN parser. Runs in a worker process, so
+    it only receives picklable (id, moves, moves_uci) triples and returns
+    a plain dict that the parent merges into the full index.
+    """
+    traces = {}
+    # O singură tablă pentru tot chunk-ul; capcanele sortate după linie
+    # împart prefixe lungi, așa că dăm pop() doar până la divergență și
+    # rejucăm exclusiv coada diferită în loc de toată linia
+    board = chess.Board()
+    prev_tokens: List[str] = []
+    prev_keys: List[int] = []
+    prev_is_uci = True
+    for trap_id, moves, moves_uci in sorted(
+            trap_entries, key=lambda e: e[2] or ' '.join(e[1])):
+        if moves_uci:
+            tokens = moves_uci.split()
+            is_uci = True
+        else:
+            tokens = [m.replace('#', '').replace('+', '') for m in moves]
+            is_uci = False
+
+        lcp = 0
+        if is_uci == prev_is_uci:
+            limit = min(len(tokens), len(prev_tokens))
+            while lcp < limit and tokens[lcp] == prev_tokens[lcp]:
+                lcp += 1
+        for _ in range(len(prev_tokens) - lcp):
+            board.pop()
+
+        keys = prev_keys[:lcp]
+        pushed = lcp
+        failed = False
+        try:
+            for token in tokens[lcp:]:
+                if is_uci:
+                    board.push(chess.Move.from_uci(token))
+                else:
+                    board.push(board.parse_san(token))
+                pushed += 1
+                keys.append(chess.polyglot.zobrist_hash(board))
+        except ValueError as e:
+            print(f"[INDEX WARNING] Skipping trap ID {trap_id}. Invalid move. Error: {e}")
+            failed = True
+
+        # Tabla rămâne la adâncimea efectiv atinsă - următoarea capcană
+        # continuă de aici, indiferent dacă linia curentă a eșuat
+        prev_tokens = tokens[:pushed]
+        prev_keys = keys
+        prev_is_uci = is_uci
+        if not failed:
+            traces[trap_id] = keys
+    return traces
+
+
+def _compute_fen_traces_parallel(trap_entries: List[Tuple[int, List[str], Optional[str]]],
+                                 log_prefix: str) -> Dict[int, List[int]]:
+    """Computes Zobrist key traces for all traps, fanning out to worker processes.
+
+    Small inputs are replayed serially - process startup would cost more
+    than the SAN parsing itself.
+    """
+    if len(trap_entries) < 1000:
+        return _replay_fen_traces_chunk(trap_entries)
+
+    num_workers = max(1, min(cpu_count() - 1, 12))  # Lasă un core pentru sistem
+    # Sortăm înainte de împărțire, ca fiecare chunk să fie un interval
+    # contiguu de linii cu prefixe comune (vezi _replay_fen_traces_chunk)
+    trap_entries = sorted(trap_entries, key=lambda e: e[2] or ' '.join(e[1]))
+    chunk_size = max(1, len(trap_entries) // num_workers + 1)
+    chunks = [trap_entries[i:i + chunk_size] for i in range(0, len(trap_entries), chunk_size)]
+
+    traces = {}
+    print(f"{log_prefix} Replaying {len(chunks)} chunks on {num_workers} workers...")
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        futures = [executor.submit(_replay_fen_traces_chunk, chunk) for chunk in chunks]
+        for future in as_completed(futures):
+            try:
+                traces.update(future.result())
+            except Exception as e:
+                print(f"{log_prefix} [ERROR] Trace worker failed: {e}")
+    return traces
+
+
+def _build_index_from_traces(trap_entries: List[Tuple[int, List[str], Optional[str], int, int]],
+                             repository, log_prefix: str) -> Dict[int, List[Tuple[int, int, int, Optional[str], int]]]:
+    """Builds the position index from on-disk key traces, replaying only the
+    traps whose trace has not been stored yet."""
+    cached_traces = repository.get_fen_traces()
+    # Urmele vechi (stringuri FEN) sunt invalide de la trecerea la chei Zobrist
+    missing = [(trap_id, moves, moves_uci)
+               for trap_id, moves, moves_uci, _color, _type_id in trap_entries
+               if trap_id not in cached_traces
+               or (cached_traces[trap_id] and not isinstance(cached_traces[trap_id][0], int))]
+
+    if missing:
+        print(f"{log_prefix} {len(missing)} traps without a cached key trace. Computing...")
+        fresh_traces = _compute_fen_traces_parallel(missing, log_prefix)
+        repository.save_fen_traces(fresh_traces)
+        cached_traces.update(fresh_traces)
+
+    index = defaultdict(list)
+    for trap_id, moves, _moves_uci, color, type_id in trap_entries:
+        keys = cached_traces.get(trap_id)
+        if not keys:
+            continue
+        last = len(moves) - 1
+        for i, key in enumerate(keys):
+            next_san = moves[i + 1] if i < last else None
+            index[key].append((trap_id, i, color, next_san, type_id))
+    return index
+
+
+class _TrapIndexServiceBase:
+    """Shared engine behind TrapService and QueenTrapService.
+
+    The two services were line-for-line clones (stats fingerprint, npz
+    cache load/save, index build, suggestion queries); everything lives
+    here once, and the subclasses only declare their cache file, log
+    prefix and how a trap maps to a type id in the index.
+    """
+
+    CACHE_FILE_PATH = ""
+    # Versiunea formatului: 8 = coloane next_move/type + vocabular SAN
+    CACHE_VERSION = 9
+    LOG_PREFIX = "[TRAP SERVICE]"
+    TRAP_NOUN = "traps"
+    # Capcanele custom filtrează sugestiile pe culoarea jucătorului curent
+    FILTER_SUGGESTIONS_BY_COLOR = False
+
+    def __init__(self, repository):
         self.repository = repository
-        print("[TRAP SERVICE] Initializing...")
+        print(f"{self.LOG_PREFIX} Initializing...")
         start_time = time.time()
-        
-        # 1. Încărcăm toate capcanele
-        self.all_traps = self.repository.get_all_traps()
-        self.id_to_trap_map = {trap.id: trap for trap in self.all_traps}
-        
+
+        # 1. Amprenta tabelei, dintr-o singură interogare agregată - fără
+        # a materializa vreun obiect de capcană
+        self.trap_count, self.id_sum, self.max_id = self.repository.get_trap_stats()
+        self._all_traps: Optional[list] = None
+        # Fetch per-ID, cu cache LRU per instanță - încărcăm doar rândurile
+        # pe care interogările le ating efectiv
+        self._fetch_trap = lru_cache(maxsize=10000)(self.repository.get_trap_by_id)
+        self._opening_books: Optional[Dict[int, OpeningBook]] = None
+        # Listele de sugestii din poziția inițială, memorate per culoare
+        self._start_suggestions: Dict[int, List[MoveSuggestion]] = {}
+
         # 2. Încercăm să încărcăm indexul din cache
         if not self._load_index_from_cache():
             # Dacă încărcarea eșuează sau cache-ul este invalid, construim indexul
-            print("[TRAP SERVICE] Cache not found or invalid. Building new position index...")
+            print(f"{self.LOG_PREFIX} Cache not found or invalid. Building new position index...")
             self.position_index = self._create_position_index()
             # Și îl salvăm pentru data viitoare
             self._save_index_to_cache()
-        
+
         end_time = time.time()
-        print(f"[TRAP SERVICE] Initialization complete in {end_time - start_time:.4f} seconds.")
-        if self.all_traps:
-            # --- AICI ESTE MODIFICAREA ---
-            trap_count_formatted = f"{len(self.all_traps):_}".replace("_", " ")
-            position_count_formatted = f"{len(self.position_index):_}".replace("_", " ")
-            print(f"               Using index for {trap_count_formatted} traps across {position_count_formatted} unique positions.")
+        print(f"{self.LOG_PREFIX} Initialization complete in {end_time - start_time:.4f} seconds.")
+        if self.trap_count:
+            pad = ' ' * (len(self.LOG_PREFIX) + 1)
+            trap_count_formatted = _format_thousands(self.trap_count)
+            position_count_formatted = _format_thousands(len(self.position_index))
+            print(f"{pad}Using index for {trap_count_formatted} {self.TRAP_NOUN} "
+                  f"across {position_count_formatted} unique positions.")
+
+    @staticmethod
+    def _type_id(trap) -> int:
+        """Index in PositionIndexSoA.TYPE_NAMES; overridden for queen traps."""
+        return 0
+
+    @property
+    def all_traps(self) -> list:
+        """Trap rows, materialized only when something actually needs them."""
+        if self._all_traps is None:
+            self._all_traps = self.repository.get_all_traps()
+        return self._all_traps
+
+    @property
+    def opening_books(self) -> Dict[int, OpeningBook]:
+        """Per-color first-move aggregates; from cache or built on first use."""
+        if self._opening_books is None:
+            self._opening_books = _build_opening_books(self.all_traps)
+        return self._opening_books
 
     def _load_index_from_cache(self) -> bool:
         """
-        Tries to load the position index from a cache file.
+        Tries to load the position index from the .npz cache file.
+        Each array comes out of the archive as one contiguous binary read -
+        fast whole-array loads, without the per-row pickling a pickled dict
+        would pay. (np.load does NOT memory-map .npz members; mmap_mode
+        only works for plain .npy files.)
         Returns True if successful and the cache is valid, False otherwise.
         """
         if not os.path.exists(self.CACHE_FILE_PATH):
-            print("[TRAP SERVICE] Cache file not found.")
+            print(f"{self.LOG_PREFIX} Cache file not found.")
             return False
-            
+
         try:
-            with open(self.CACHE_FILE_PATH, 'rb') as f:
-                print(f"[TRAP SERVICE] Reading cache file: {self.CACHE_FILE_PATH}")
-                cache_data = pickle.load(f)
-            
-            cached_trap_count = cache_data['trap_count']
-            cached_id_sum = cache_data['id_sum']
-            
-            # Validarea cache-ului
-            current_trap_count = len(self.all_traps)
-            current_id_sum = sum(trap.id for trap in self.all_traps if trap.id is not None)
-            
-            if current_trap_count == cached_trap_count and current_id_sum == cached_id_sum:
+            print(f"{self.LOG_PREFIX} Loading cache file: {self.CACHE_FILE_PATH}")
+            cache_data = np.load(self.CACHE_FILE_PATH)
+
+            meta = cache_data['meta']
+            if int(meta[0]) != self.CACHE_VERSION:
+                print(f"{self.LOG_PREFIX} Cache has an old format version. It will be rebuilt.")
+                return False
+
+            # Validarea cache-ului pe baza amprentei SQL agregate
+            if (self.trap_count == int(meta[1]) and self.id_sum == int(meta[2])
+                    and self.max_id == int(meta[3])):
                 # Cache-ul este valid! Îl folosim.
-                self.position_index = cache_data['index']
-                print("[TRAP SERVICE] Cache is valid and loaded successfully.")
+                vocab = [sys.intern(str(s)) for s in cache_data['vocab'].tolist()]
+                self.position_index = PositionIndexSoA(
+                    cache_data['keys'], cache_data['offsets'],
+                    cache_data['trap_ids'], cache_data['move_indices'],
+                    cache_data['colors'], cache_data['next_move_ids'],
+                    cache_data['type_ids'], vocab)
+                self._opening_books = pickle.loads(cache_data['opening_books'].tobytes())
+                print(f"{self.LOG_PREFIX} Cache is valid and loaded successfully.")
                 return True
             else:
                 # Cache-ul este invalid (datele din DB s-au schimbat)
-                print("[TRAP SERVICE] Cache is stale. DB has changed.")
+                print(f"{self.LOG_PREFIX} Cache is stale. DB has changed.")
                 return False
-                
-        except (pickle.UnpicklingError, KeyError, EOFError) as e:
-            # Fișierul de cache este corupt sau are un format vechi
-            print(f"[TRAP SERVICE] Cache file is corrupt or invalid: {e}. It will be rebuilt.")
+
+        except (IOError, ValueError, KeyError, EOFError, zlib.error,
+                zipfile.BadZipFile, pickle.UnpicklingError) as e:
+            # Fișierul de cache este corupt sau are un format vechi;
+            # un zip trunchiat ridică BadZipFile, nu IOError/ValueError
+            print(f"{self.LOG_PREFIX} Cache file is corrupt or invalid: {e}. It will be rebuilt.")
             return False
 
     def _save_index_to_cache(self) -> None:
         """
-        Saves the current position index and validation data to the cache file.
+        Saves the current position index arrays and validation data to the
+        cache file with np.savez, so the next startup reads them back as
+        flat binary arrays instead of rebuilding the index from the DB.
         """
         if not hasattr(self, 'position_index') or not self.position_index:
-            print("[TRAP SERVICE] Index is empty, not saving cache.")
+            print(f"{self.LOG_PREFIX} Index is empty, not saving cache.")
             return
-            
-        print(f"[TRAP SERVICE] Saving new index to cache file: {self.CACHE_FILE_PATH}")
-        
-        cache_data = {
-            'trap_count': len(self.all_traps),
-            'id_sum': sum(trap.id for trap in self.all_traps if trap.id is not None),
-            'index': self.position_index
-        }
-        
+
+        print(f"{self.LOG_PREFIX} Saving new index to cache file: {self.CACHE_FILE_PATH}")
+
+        meta = np.array([self.CACHE_VERSION, self.trap_count,
+                         self.id_sum, self.max_id], dtype=np.int64)
+
         try:
-            with open(self.CACHE_FILE_PATH, 'wb') as f:
-                pickle.dump(cache_data, f, protocol=pickle.HIGHEST_PROTOCOL)
-            print("[TRAP SERVICE] Cache saved successfully.")
+            index = self.position_index
+            # Doar agregatele de prim nivel - un blob mic, mărginit de
+            # numărul de prime mutări distincte, nu de numărul de capcane
+            books_blob = np.frombuffer(
+                pickle.dumps(self.opening_books, protocol=pickle.HIGHEST_PROTOCOL),
+                dtype=np.uint8)
+            # Scriem într-un fișier temporar și redenumim atomic, ca un crash
+            # în timpul scrierii să nu lase un cache pe jumătate scris
+            tmp_path = self.CACHE_FILE_PATH + '.tmp'
+            with open(tmp_path, 'wb') as cache_file:
+                np.savez(cache_file, meta=meta, keys=index.keys,
+                         offsets=index.offsets, trap_ids=index.trap_ids,
+                         move_indices=index.move_indices, colors=index.colors,
+                         next_move_ids=index.next_move_ids, type_ids=index.type_ids,
+                         vocab=np.asarray(index.vocab, dtype=str),
+                         opening_books=books_blob)
+            os.replace(tmp_path, self.CACHE_FILE_PATH)
+            print(f"{self.LOG_PREFIX} Cache saved successfully.")
         except IOError as e:
-            print(f"[TRAP SERVICE] [ERROR] Could not write cache file: {e}")
-
-    def _create_position_index(self) -> Dict[str, List[Tuple[int, int]]]:
-        index = defaultdict(list)
-        for trap in self.all_traps:
-            if trap.id is None: continue
-            board = chess.Board()
-            try:
-                for i, move_san in enumerate(trap.moves):
-                    clean_san = move_san.replace('#', '').replace('+', '')
-                    move = board.parse_san(clean_san)
-                    board.push(move)
-                    positional_fen = board.shredder_fen()
-                    index[positional_fen].append((trap.id, i))
-            except ValueError as e:
-                print(f"[INDEX WARNING] Skipping trap ID {trap.id} ('{trap.name}'). Invalid move: '{move_san}'. Error: {e}")
-                continue
-        return index
+            print(f"{self.LOG_PREFIX} [ERROR] Could not write cache file: {e}")
 
-    def _get_matches_for_current_position(self, game_state: GameState) -> List[Tuple[ChessTrap, int]]:
-        """Găsește TOATE capcanele care trec prin poziția curentă."""
-        if game_state.is_recording:
-            return []
-        current_fen = game_state.board.shredder_fen()
-        matching_entries = self.position_index.get(current_fen, [])
-        
-        # Returnăm direct, fără a filtra după culoare aici
-        return [(self.id_to_trap_map[trap_id], move_index) 
-                for trap_id, move_index in matching_entries if trap_id in self.id_to_trap_map]
+    def _create_position_index(self) -> PositionIndexSoA:
+        trap_entries = [(trap.id, trap.moves, trap.moves_uci, int(trap.color),
+                         self._type_id(trap))
+                        for trap in self.all_traps if trap.id is not None]
+        return PositionIndexSoA.from_dict(
+            _build_index_from_traces(trap_entries, self.repository, self.LOG_PREFIX))
 
     def count_matching_traps(self, game_state: GameState) -> int:
         """Numără capcanele care se potrivesc cu poziția curentă, folosind indexul."""
-        if not self.all_traps:
+        if not self.trap_count or game_state.is_recording:
             return 0
-            
-        # La începutul jocului, FEN-ul este unic, deci putem folosi logica nouă
+
+        # La început numărăm intrările de pe mutarea 0 - câte o intrare per capcană
         if game_state.board.fullmove_number == 1 and game_state.board.turn == chess.WHITE:
-             return sum(1 for trap in self.all_traps if trap.color == game_state.current_player)
+            return self.position_index.count_first_moves(int(game_state.current_player))
 
-        return len(self._get_matches_for_current_position(game_state))
+        current_key = game_state.zobrist()
+        return self.position_index.count(current_key)
 
-    # --- ÎNLOCUIEȘTE COMPLET ÎN `TrapService` ---
     def get_aggregated_suggestions(self, game_state: GameState) -> List[MoveSuggestion]:
         if game_state.board.turn != game_state.current_player: return []
-        move_groups = defaultdict(list)
-        
+
         if not game_state.move_history:
-            for trap in self.all_traps:
-                if trap.color == game_state.current_player and trap.moves:
-                    move_groups[trap.moves[0]].append(trap.moves)
-        else:
-            matches = self._get_matches_for_current_position(game_state)
-            for trap, move_index in matches:
-                if len(trap.moves) > move_index + 1:
-                    is_our_turn_in_trap = (move_index + 1) % 2 == (0 if trap.color == chess.WHITE else 1)
-                    if is_our_turn_in_trap:
-                        move_groups[trap.moves[move_index + 1]].append(trap.moves[move_index + 1:])
-        
-        return [
-            MoveSuggestion(
+            color = int(game_state.current_player)
+            suggestions = self._start_suggestions.get(color)
+            if suggestions is None:
+                book = self.opening_books[color]
+                suggestions = [
+                    MoveSuggestion(
+                        suggested_move=move,
+                        trap_count=count,
+                        example_trap_line=example_line,
+                        trap_type=trap_type
+                    ) for (move, trap_type), (count, example_line) in book.items()
+                ]
+                self._start_suggestions[color] = suggestions
+            return suggestions
+
+        # Gruparea pe (mutare, tip) și testul de paritate rulează vectorizat
+        # în index; un singur rând de capcană e citit per mutare sugerată
+        color = int(game_state.current_player) if self.FILTER_SUGGESTIONS_BY_COLOR else None
+        current_key = game_state.zobrist()
+        groups = self.position_index.next_move_counts(current_key, color=color)
+        suggestions = []
+        for (move, type_name), (count, example_id, example_index) in groups.items():
+            example_trap = self._fetch_trap(example_id)
+            if example_trap is None:
+                continue
+            suggestions.append(MoveSuggestion(
                 suggested_move=move,
-                trap_count=len(lines),
-                # CORECȚIE: lines[0] este deja continuarea completă de care avem nevoie
-                example_trap_line=lines[0], 
-                trap_type='checkmate'
-            ) for move, lines in move_groups.items()
-        ]
+                trap_count=count,
+                example_trap_line=example_trap.moves[example_index + 1:],
+                trap_type=type_name
+            ))
+        return suggestions
 
     def get_most_common_response(self, game_state: GameState) -> Optional[str]:
         """Găsește cel mai comun răspuns al adversarului folosind indexul."""
         if game_state.board.turn == game_state.current_player:
             return None
 
-        matches = self._get_matches_for_current_position(game_state)
-        response_counts = defaultdict(int)
-        
-        for trap, move_index in matches:
-            # Răspunsul adversarului este următoarea mutare din linie
-            if len(trap.moves) > move_index + 1:
-                opponent_response_san = trap.moves[move_index + 1]
-                response_counts[opponent_response_san] += 1
-        
-        if not response_counts:
-            return None
-            
-        return max(response_counts, key=response_counts.get)
+        # Numărătoarea continuărilor rulează pe coloana next_move din index
+        current_key = game_state.zobrist()
+        return self.position_index.most_common_next(current_key)
 
-    def add_new_trap_dynamically(self, trap: ChessTrap):
+    def add_new_trap_dynamically(self, trap):
         """Adaugă o capcană nouă în memorie fără a reîncărca totul."""
         if trap.id is None: return
 
+        # Mutările venite din UI nu au trecut prin _load_moves; le internăm
+        # aici ca overlay-ul și agregatele de deschidere să partajeze aceleași obiecte SAN
+        trap.moves = [sys.intern(move_san) for move_san in trap.moves]
         self.all_traps.append(trap)
-        self.id_to_trap_map[trap.id] = trap
+        self._fetch_trap.cache_clear()
+        self.trap_count += 1
+        self.id_sum += trap.id
+        self.max_id = max(self.max_id, trap.id)
+        type_id = self._type_id(trap)
+        self._start_suggestions.pop(int(trap.color), None)
+        if self._opening_books is not None and trap.moves:
+            _bump_opening_entry(self._opening_books[int(trap.color)],
+                                trap.moves, PositionIndexSoA.TYPE_NAMES[type_id])
+
+        if not self._index_trap_line(trap):
+            return
 
+        print(f"{self.LOG_PREFIX} Trap {trap.id} added dynamically to memory.")
+
+    def _index_trap_line(self, trap) -> bool:
+        """Replays one trap's SAN line into the position index overlay."""
+        type_id = self._type_id(trap)
+        last = len(trap.moves) - 1
         board = chess.Board()
         try:
             for i, move_san in enumerate(trap.moves):
                 clean_san = move_san.replace('#', '').replace('+', '')
                 move = board.parse_san(clean_san)
                 board.push(move)
-                positional_fen = board.shredder_fen()
-                self.position_index[positional_fen].append((trap.id, i))
+                position_key = chess.polyglot.zobrist_hash(board)
+                next_san = trap.moves[i + 1] if i < last else None
+                self.position_index.add_entry(position_key, trap.id, i, int(trap.color),
+                                              next_san, type_id)
         except ValueError:
             print(f"[DYNAMIC INDEX] Failed to index new trap {trap.id}")
+            return False
+        return True
+
+    def apply_delta(self, added_ids, removed_ids=(), color_updates=()) -> None:
+        """Patches the in-memory index for a known row delta.
+
+        Import and audit know exactly which rows they added, removed or
+        recolored, so the O(N) rebuild of the whole index is replaced
+        with O(delta) work; only the rows in the delta are fetched from
+        the database. The patched index is compacted and saved back to
+        the cache file, so the next startup maps it as usual.
+        """
+        added_ids = list(added_ids)
+        removed_ids = list(removed_ids)
+        color_updates = list(color_updates)
+        if not (added_ids or removed_ids or color_updates):
             return
-        
-        print(f"[TRAP SERVICE] Trap {trap.id} added dynamically to memory.")
 
-class QueenTrapService:
-    """
-    Service for managing queen trap logic and suggestions with on-disk caching.
-    Este o paralelă a lui TrapService, dar pentru tabela queen_traps.
-    """
-    CACHE_FILE_PATH = "queen_trap_index.cache"
-    
-    def __init__(self, repository: QueenTrapRepository):
-        self.repository = repository
-        print("[QUEEN TRAP SERVICE] Initializing...")
+        print(f"{self.LOG_PREFIX} Applying delta: +{len(added_ids)}, "
+              f"-{len(removed_ids)}, {len(color_updates)} recolored...")
         start_time = time.time()
-        
-        self.all_traps = self.repository.get_all_traps()
-        self.id_to_trap_map = {trap.id: trap for trap in self.all_traps}
-        
-        if not self._load_index_from_cache():
-            print("[QUEEN TRAP SERVICE] Cache not found or invalid. Building new index...")
-            self.position_index = self._create_position_index()
-            self._save_index_to_cache()
-        
-        end_time = time.time()
-        print(f"[QUEEN TRAP SERVICE] Initialization complete in {end_time - start_time:.4f} seconds.")
-        if self.all_traps:
-            trap_count_formatted = f"{len(self.all_traps):_}".replace("_", " ")
-            position_count_formatted = f"{len(self.position_index):_}".replace("_", " ")
-            print(f"                     Using index for {trap_count_formatted} queen traps across {position_count_formatted} unique positions.")
-
-    def _load_index_from_cache(self) -> bool:
-        if not os.path.exists(self.CACHE_FILE_PATH):
-            return False
-        try:
-            with open(self.CACHE_FILE_PATH, 'rb') as f:
-                cache_data = pickle.load(f)
-            current_trap_count = len(self.all_traps)
-            current_id_sum = sum(trap.id for trap in self.all_traps if trap.id is not None)
-            if current_trap_count == cache_data.get('trap_count') and current_id_sum == cache_data.get('id_sum'):
-                self.position_index = cache_data['index']
-                print("[QUEEN TRAP SERVICE] Cache is valid and loaded.")
-                return True
-            return False
-        except Exception as e:
-            print(f"[QUEEN TRAP SERVICE] Cache load failed: {e}. Rebuilding.")
-            return False
 
-    def _save_index_to_cache(self) -> None:
-        if not hasattr(self, 'position_index') or not self.position_index:
-            return
-        cache_data = {
-            'trap_count': len(self.all_traps),
-            'id_sum': sum(trap.id for trap in self.all_traps if trap.id is not None),
-            'index': self.position_index
-        }
-        try:
-            with open(self.CACHE_FILE_PATH, 'wb') as f:
-                pickle.dump(cache_data, f, protocol=pickle.HIGHEST_PROTOCOL)
-        except IOError as e:
-            print(f"[QUEEN TRAP SERVICE] [ERROR] Could not write cache file: {e}")
+        # Amprenta SQL se reîmprospătează, ca header-ul cache-ului salvat
+        # mai jos să valideze la următorul startup
+        self.trap_count, self.id_sum, self.max_id = self.repository.get_trap_stats()
+        self._all_traps = None
+        self._fetch_trap.cache_clear()
+        self._start_suggestions.clear()
 
-    def _create_position_index(self) -> Dict[str, List[Tuple[int, int]]]:
-        index = defaultdict(list)
-        for trap in self.all_traps:
-            if trap.id is None: continue
-            board = chess.Board()
-            try:
-                for i, move_san in enumerate(trap.moves):
-                    clean_san = move_san.replace('#', '').replace('+', '')
-                    move = board.parse_san(clean_san)
-                    board.push(move)
-                    positional_fen = board.shredder_fen()
-                    index[positional_fen].append((trap.id, i))
-            except ValueError as e:
-                print(f"[QUEEN INDEX WARNING] Skipping trap ID {trap.id} ('{trap.name}'). Invalid move: '{move_san}'. Error: {e}")
+        if removed_ids:
+            self.position_index.remove_traps(removed_ids)
+        if color_updates:
+            self.position_index.update_colors(color_updates)
+        if removed_ids or color_updates:
+            # Rândurile șterse nu mai pot fi citite ca să le scădem din
+            # agregate; se reconstruiesc lazy din all_traps
+            self._opening_books = None
+
+        for trap_id in added_ids:
+            trap = self._fetch_trap(trap_id)
+            if trap is None:
                 continue
-        return index
-
-    def _get_matches_for_current_position(self, game_state: GameState) -> List[Tuple[QueenTrap, int]]:
-        """Găsește TOATE capcanele custom care trec prin poziția curentă."""
-        if game_state.is_recording:
-            return []
-        current_fen = game_state.board.shredder_fen()
-        matching_entries = self.position_index.get(current_fen, [])
+            trap.moves = [sys.intern(move_san) for move_san in trap.moves]
+            if self._opening_books is not None and trap.moves:
+                _bump_opening_entry(self._opening_books[int(trap.color)],
+                                    trap.moves, PositionIndexSoA.TYPE_NAMES[self._type_id(trap)])
+            self._index_trap_line(trap)
+
+        # Intrările noi stau în overlay; le pliem în arrays înainte de
+        # salvare, pentru că fișierul de cache conține doar arrays
+        self.position_index.compact()
+        self._save_index_to_cache()
+        print(f"{self.LOG_PREFIX} Delta applied in {time.time() - start_time:.4f} seconds.")
 
-        return [(self.id_to_trap_map[trap_id], move_index) 
-                for trap_id, move_index in matching_entries if trap_id in self.id_to_trap_map]
-    
     def force_reload(self):
         """Forțează reîncărcarea datelor din repository și reconstruirea indexului."""
-        print("[QUEEN TRAP SERVICE] Forcing data reload...")
-        self.all_traps = self.repository.get_all_traps()
-        self.id_to_trap_map = {trap.id: trap for trap in self.all_traps}
+        print(f"{self.LOG_PREFIX} Forcing data reload...")
+        self.trap_count, self.id_sum, self.max_id = self.repository.get_trap_stats()
+        self._all_traps = None
+        self._fetch_trap.cache_clear()
+        self._opening_books = None
+        self._start_suggestions.clear()
         self.position_index = self._create_position_index()
         self._save_index_to_cache()
-        print("[QUEEN TRAP SERVICE] Reload complete.")
+        print(f"{self.LOG_PREFIX} Reload complete.")
 
-    def get_aggregated_suggestions(self, game_state: GameState) -> List[MoveSuggestion]:
-        if game_state.board.turn != game_state.current_player: return []
-        move_groups = defaultdict(list)
 
-        if not game_state.move_history:
-            for trap in self.all_traps:
-                if trap.color == game_state.current_player and trap.moves:
-                    key = 'checkmate' if 'Checkmate' in trap.trap_type else 'queen_hunter'
-                    move_groups[(trap.moves[0], key)].append(trap.moves)
-        else:
-            matches = self._get_matches_for_current_position(game_state)
-            for trap, move_index in matches:
-                is_our_turn_in_trap = (move_index + 1) % 2 == (0 if trap.color == chess.WHITE else 1)
-                if trap.color == game_state.current_player and len(trap.moves) > move_index + 1 and is_our_turn_in_trap:
-                    next_move = trap.moves[move_index + 1]
-                    continuation = trap.moves[move_index + 1:]
-                    key = 'checkmate' if 'Checkmate' in trap.trap_type else 'queen_hunter'
-                    move_groups[(next_move, key)].append(continuation)
-
-        return [
-            MoveSuggestion(
-                suggested_move=move,
-                trap_count=len(lines),
-                # CORECȚIE: lines[0] este deja continuarea completă
-                example_trap_line=lines[0], 
-                trap_type=type
-            ) for (move, type), lines in move_groups.items()
-        ]
+class TrapService(_TrapIndexServiceBase):
+    """
+    Service for managing trap logic and suggestions using position-based indexing
+    with on-disk caching for fast startup.
+    """
 
-    def get_most_common_response(self, game_state: GameState) -> Optional[str]:
-        """Găsește cel mai comun răspuns al adversarului pentru capcanele de regină."""
-        if game_state.board.turn == game_state.current_player:
-            return None
+    CACHE_FILE_PATH = "trap_index.npz"
+    LOG_PREFIX = "[TRAP SERVICE]"
 
-        matches = self._get_matches_for_current_position(game_state)
-        response_counts = defaultdict(int)
-        
-        for trap, move_index in matches:
-            if len(trap.moves) > move_index + 1:
-                opponent_response_san = trap.moves[move_index + 1]
-                response_counts[opponent_response_san] += 1
-        
-        if not response_counts:
-            return None
-            
-        return max(response_counts, key=response_counts.get)
 
-    def add_new_trap_dynamically(self, trap: QueenTrap):
-        """Adaugă o capcană nouă în memorie fără a reîncărca totul."""
-        if trap.id is None: return
+class QueenTrapService(_TrapIndexServiceBase):
+    """
+    Service for managing queen trap logic and suggestions with on-disk caching.
+    Este o paralelă a lui TrapService, dar pentru tabela queen_traps.
+    """
 
-        self.all_traps.append(trap)
-        self.id_to_trap_map[trap.id] = trap
+    CACHE_FILE_PATH = "queen_trap_index.npz"
+    LOG_PREFIX = "[QUEEN TRAP SERVICE]"
+    TRAP_NOUN = "queen traps"
+    FILTER_SUGGESTIONS_BY_COLOR = True
 
-        board = chess.Board()
-        try:
-            for i, move_san in enumerate(trap.moves):
-                clean_san = move_san.replace('#', '').replace('+', '')
-                move = board.parse_san(clean_san)
-                board.push(move)
-                positional_fen = board.shredder_fen()
-                self.position_index[positional_fen].append((trap.id, i))
-        except ValueError:
-            print(f"[DYNAMIC INDEX] Failed to index new queen trap {trap.id}")
-            return
-            
-        print(f"[QUEEN TRAP SERVICE] Trap {trap.id} added dynamically to memory.")
+    @staticmethod
+    def _type_id(trap) -> int:
+        return 0 if 'Checkmate' in trap.trap_type else 1
+
+
+# Numerele de mutare din movetext ("12." / "12..."); folosit de pre-filtrul
+# pe bytes. Cerem început de rând / spațiu / paranteză înaintea cifrelor, ca
+# să nu prindem fragmente de alte token-uri.
+_PGN_MOVE_NUMBER_RE = re.compile(rb'(?:^|[\s(])(\d+)\.')
+# Comentariile {...} (ex. [%eval 0.36], [%clk 0:03:00]) conțin zecimale care
+# ar păcăli pre-filtrul ("0." ar deveni ultimul "număr de mutare" și partida
+# ar fi respinsă pe nedrept); le eliminăm înainte de scanare.
+_PGN_COMMENT_RE = re.compile(rb'\{[^}]*\}')
 
-    def count_matching_traps(self, game_state: GameState) -> int:
-        """Numără capcanele custom care se potrivesc cu poziția curentă."""
-        if not self.all_traps or game_state.is_recording:
-            return 0
-            
-        if not game_state.move_history:
-             return sum(1 for trap in self.all_traps if trap.color == game_state.current_player)
 
-        return len(self._get_matches_for_current_position(game_state))
+class _MoveCollectorVisitor(chess.pgn.BaseVisitor):
+    """Colectează mutările și headerele direct în timpul parsării PGN.
+
+    Evită construcția arborelui de noduri Game; visit_move doar adaugă
+    obiectul Move, fără board.san() - generarea SAN (scumpă, cu
+    dezambiguizare) se face mai târziu, doar pentru jocurile care trec
+    de filtrul de mat.
+    """
+
+    def __init__(self):
+        self.moves: List[chess.Move] = []
+        self.headers: Dict[str, str] = {}
+
+    def visit_header(self, tagname: str, tagvalue: str) -> None:
+        self.headers[tagname] = tagvalue
+
+    def visit_move(self, board: chess.Board, move: chess.Move) -> None:
+        self.moves.append(move)
+
+    def begin_variation(self):
+        # Ne interesează doar linia principală
+        return chess.pgn.SKIP
+
+    def result(self) -> "_MoveCollectorVisitor":
+        return self
+
 
 class PGNImportService:
     """Service for importing traps from PGN files."""
@@ -880,24 +1729,27 @@ class PGNImportService:
     def __init__(self, repository: TrapRepository):
         self.repository = repository
     
-    def import_from_file(self, file_path: str, max_moves: int = 25, checkmate_only: bool = False, progress_callback=None) -> Tuple[int, int]:
-        """Import traps from a single PGN file."""
+    def import_from_file(self, file_path: str, max_moves: int = 25, checkmate_only: bool = False,
+                         progress_callback=None) -> Tuple[int, int, List[int]]:
+        """Import traps from a single PGN file.
+
+        Returns the imported (white, black) counts plus the ids of the
+        newly inserted rows, so the caller can delta-patch its indexes.
+        """
         print(f"[DEBUG PGN] Starting import from: {file_path}")
-        
+
         try:
-            white_traps, black_traps = self._parse_pgn_file(file_path, max_moves, checkmate_only)
-            
-            white_imported = self.repository.import_traps(white_traps)
-            black_imported = self.repository.import_traps(black_traps)
-            
+            white_imported, black_imported, added_ids = self._parse_pgn_file(
+                file_path, max_moves, checkmate_only, progress_callback)
+
             print(f"[DEBUG PGN] Import completed: {white_imported} white, {black_imported} black")
-            return white_imported, black_imported
-            
+            return white_imported, black_imported, added_ids
+
         except Exception as e:
             print(f"[DEBUG PGN ERROR] Import failed: {e}")
             import traceback
             traceback.print_exc()
-            return 0, 0
+            return 0, 0, []
     
     def import_from_folder(self, folder_path: str, max_moves: int = 25, checkmate_only: bool = False) -> Tuple[int, int]:
         """Import traps from all PGN files in a folder using parallel processing."""
@@ -912,25 +1764,18 @@ class PGNImportService:
         
         print(f"[DEBUG FOLDER] Found {len(pgn_files)} PGN files to process...")
         start_time = time.time()
-        
-        # Procesăm fișierele în paralel (dar nu prea multe deodată pentru a evita probleme de memorie)
-        max_concurrent_files = min(4, cpu_count() // 2)  # Procesăm max 4 fișiere simultan
-        
-        with ProcessPoolExecutor(max_workers=max_concurrent_files) as executor:
-            future_to_file = {
-                executor.submit(self.import_from_file, str(pgn_file), max_moves, checkmate_only): pgn_file
-                for pgn_file in pgn_files
-            }
-            
-            for future in as_completed(future_to_file):
-                pgn_file = future_to_file[future]
-                try:
-                    white_count, black_count = future.result()
-                    total_white += white_count
-                    total_black += black_count
-                    print(f"[DEBUG FOLDER] Completed: {pgn_file.name} - {white_count} white, {black_count} black")
-                except Exception as e:
-                    print(f"[DEBUG FOLDER] Error processing {pgn_file.name}: {e}")
+
+        # Un singur pool plat peste toate fișierele: părintele face split-ul
+        # (un scan regex ieftin per fișier), worker-ii doar parsează chunk-uri.
+        # Fișierele sunt consumate în flux, unul după altul - nu mai ținem
+        # toate jocurile din folder simultan în memorie.
+        def folder_games() -> Iterator[bytes]:
+            for pgn_file in pgn_files:
+                print(f"[DEBUG FOLDER] Reading {pgn_file.name}...")
+                yield from self._iter_pgn_games(str(pgn_file))
+
+        total_white, total_black, _added_ids = self._parse_games_parallel(
+            folder_games(), max_moves, checkmate_only)
         
         elapsed = time.time() - start_time
         print(f"\n[DEBUG FOLDER] SUMMARY:")
@@ -941,107 +1786,189 @@ class PGNImportService:
         
         return total_white, total_black
     
-    def _parse_pgn_file(self, file_path: str, max_moves: int, checkmate_only: bool) -> Tuple[List[ChessTrap], List[ChessTrap]]:
-        """Optimized parser that processes games in chunks using multiprocessing."""
+    def _parse_pgn_file(self, file_path: str, max_moves: int, checkmate_only: bool,
+                        progress_callback=None) -> Tuple[int, int, List[int]]:
+        """Optimized parser that streams games into a process pool."""
         print(f"[DEBUG PGN PARSE] Opening file with MULTICORE method: {file_path}")
-        
-        # Citim toate jocurile o dată și le împărțim în chunk-uri
-        games_data = []
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as pgn_file:
-            game_strings = []
-            current_game_lines = []
-            
-            for line in pgn_file:
-                line = line.strip()
-                if line.startswith('[') or line:  # Header sau mutări
-                    current_game_lines.append(line)
-                elif current_game_lines:  # Linie goală = sfârșitul unui joc
-                    game_strings.append('\n'.join(current_game_lines))
-                    current_game_lines = []
-            
-            # Nu uita ultimul joc dacă fișierul nu se termină cu linie goală
-            if current_game_lines:
-                game_strings.append('\n'.join(current_game_lines))
-        
-        print(f"[DEBUG PGN PARSE] Found {len(game_strings)} games to process")
-        
-        # Determinăm numărul optim de worker-i
-        num_workers = min(cpu_count() - 1, 12)  # Lasă un core pentru sistem
-        chunk_size = max(100, len(game_strings) // (num_workers * 4))  # Chunk-uri mai mici pentru load balancing mai bun
-        
-        # Împărțim jocurile în chunk-uri
-        chunks = [game_strings[i:i + chunk_size] for i in range(0, len(game_strings), chunk_size)]
-        
-        white_traps = []
-        black_traps = []
-        
-        print(f"[DEBUG PGN PARSE] Using {num_workers} workers with {len(chunks)} chunks")
+        return self._parse_games_parallel(
+            self._iter_pgn_games(file_path), max_moves, checkmate_only, progress_callback)
+
+    # Câte jocuri primește un worker per task
+    PARSE_CHUNK_SIZE = 1000
+    # La câte capcane acumulate golim bufferele într-o tranzacție SQLite
+    IMPORT_FLUSH_THRESHOLD = 10000
+
+    def _parse_games_parallel(self, games: Iterator[bytes], max_moves: int,
+                              checkmate_only: bool,
+                              progress_callback=None) -> Tuple[int, int, List[int]]:
+        """Feed a stream of raw games through the process pool in chunks.
+
+        The game iterator is consumed lazily with a bounded window of
+        in-flight chunks, so peak memory stays O(window), not O(file) -
+        multi-GB PGN files no longer need to fit in RAM. Surviving traps
+        are flushed to the repository in batches of IMPORT_FLUSH_THRESHOLD
+        rows, each batch one executemany transaction (one fsync), so the
+        trap buffers never grow unbounded either. Returns the imported
+        (white, black) counts.
+        """
+        num_workers = max(1, min(cpu_count() - 1, 12))  # Lasă un core pentru sistem
+        max_pending = num_workers * 4
+
+        white_buf: List[ChessTrap] = []
+        black_buf: List[ChessTrap] = []
+        white_imported = 0
+        black_imported = 0
+        added_ids: List[int] = []
+        games_seen = 0
+        chunks_done = 0
+
+        print(f"[DEBUG PGN PARSE] Using {num_workers} workers, chunks of {self.PARSE_CHUNK_SIZE} games")
         start_time = time.time()
-        
-        # Procesăm chunk-urile în paralel
+
+        def flush() -> None:
+            nonlocal white_imported, black_imported
+            if not white_buf and not black_buf:
+                return
+            w, b, new_ids = self.repository.import_traps_pair(white_buf, black_buf)
+            white_imported += w
+            black_imported += b
+            added_ids.extend(new_ids)
+            white_buf.clear()
+            black_buf.clear()
+
+        def drain(future) -> None:
+            nonlocal chunks_done
+            chunk_white, chunk_black = future.result()
+            white_buf.extend(chunk_white)
+            black_buf.extend(chunk_black)
+            if len(white_buf) + len(black_buf) >= self.IMPORT_FLUSH_THRESHOLD:
+                flush()
+            chunks_done += 1
+            if chunks_done % 10 == 0:
+                print(f"  ... processed chunk {chunks_done}")
+            if progress_callback is not None:
+                progress_callback(games_seen)
+
         with ProcessPoolExecutor(max_workers=num_workers) as executor:
-            # Submit all chunks for processing
-            future_to_chunk = {
-                executor.submit(self._process_games_chunk, chunk, max_moves, checkmate_only): i 
-                for i, chunk in enumerate(chunks)
-            }
-            
-            # Collect results as they complete
-            for future in as_completed(future_to_chunk):
-                chunk_idx = future_to_chunk[future]
-                try:
-                    chunk_white, chunk_black = future.result()
-                    white_traps.extend(chunk_white)
-                    black_traps.extend(chunk_black)
-                    
-                    if chunk_idx % 10 == 0:  # Progress update
-                        print(f"  ... processed chunk {chunk_idx + 1}/{len(chunks)}")
-                except Exception as e:
-                    print(f"[DEBUG PGN PARSE] Error processing chunk {chunk_idx}: {e}")
-        
+            worker = partial(self._process_games_chunk, max_moves=max_moves, checkmate_only=checkmate_only)
+            pending: "deque" = deque()
+            while True:
+                chunk = list(islice(games, self.PARSE_CHUNK_SIZE))
+                if not chunk:
+                    break
+                games_seen += len(chunk)
+                pending.append(executor.submit(worker, chunk))
+                # Fereastră limitată de task-uri în zbor: când e plină,
+                # blocăm pe cel mai vechi înainte să mai citim din fișier
+                if len(pending) >= max_pending:
+                    drain(pending.popleft())
+            while pending:
+                drain(pending.popleft())
+        flush()
+
         elapsed = time.time() - start_time
-        print(f"[DEBUG PGN PARSE] Processed {len(game_strings)} games in {elapsed:.2f} seconds")
-        print(f"[DEBUG PGN PARSE] Found: {len(white_traps)} white traps, {len(black_traps)} black traps")
-        
-        return white_traps, black_traps
+        print(f"[DEBUG PGN PARSE] Processed {games_seen} games in {elapsed:.2f} seconds")
+        print(f"[DEBUG PGN PARSE] Imported: {white_imported} white traps, {black_imported} black traps")
+
+        return white_imported, black_imported, added_ids
+
+    @staticmethod
+    def _iter_pgn_games(file_path: str) -> Iterator[bytes]:
+        """Yields per-game byte strings, one game at a time.
 
+        Game boundaries (blank line followed by the next game's first
+        header tag) are found with one C-level regex scan over a mmap of
+        the file; slicing the mmap copies out just the current game, so
+        the caller never holds the whole file in memory.
+        """
+        with open(file_path, 'rb') as pgn_file:
+            try:
+                mm = mmap.mmap(pgn_file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # Fișier gol
+                return
+            try:
+                start = 0
+                for match in re.finditer(rb'\n\s*\n(?=\[)', mm):
+                    game = mm[start:match.end()].strip()
+                    if game:
+                        yield game
+                    start = match.end()
+                tail = mm[start:].strip()
+                if tail:
+                    yield tail
+            finally:
+                mm.close()
 
     @staticmethod
-    def _process_games_chunk(game_strings: List[str], max_moves: int, checkmate_only: bool) -> Tuple[List[ChessTrap], List[ChessTrap]]:
+    def _process_games_chunk(game_strings: List[bytes], max_moves: int, checkmate_only: bool) -> Tuple[List[ChessTrap], List[ChessTrap]]:
         """Process a chunk of games. This runs in a separate process."""
         import chess.pgn  # Re-import în fiecare proces
         import io
         
         white_traps = []
         black_traps = []
-        
+        seen_movetexts = set()
+
         for game_string in game_strings:
             try:
-                # Parsează jocul din string
-                game = chess.pgn.read_game(io.StringIO(game_string))
-                if game is None:
+                # Pre-filtru ieftin la nivel de bytes: respingem majoritatea
+                # jocurilor înainte de read_game (parsarea e partea scumpă).
+                # Verdictul final rămâne la parserul complet de mai jos.
+                if isinstance(game_string, bytes):
+                    if checkmate_only and b'#' not in game_string:
+                        continue
+                    # Partidele remiză sau neterminate nu se pot încheia cu mat;
+                    # le respingem direct din headerul Result, tot la nivel de bytes
+                    if (b'[Result "' in game_string
+                            and b'[Result "1-0"]' not in game_string
+                            and b'[Result "0-1"]' not in game_string):
+                        continue
+                    movetext_start = game_string.rfind(b'\n\n')
+                    movetext = game_string[movetext_start:] if movetext_start != -1 else game_string
+                    # Corpurile PGN publice sunt pline de dubluri; hash-uim doar
+                    # movetext-ul, ca aceeași partidă cu alte headere să cadă la fel.
+                    # Oricum auditul le-ar șterge - aici nici nu le mai parsăm.
+                    movetext_hash = hashlib.blake2b(movetext, digest_size=16).digest()
+                    if movetext_hash in seen_movetexts:
+                        continue
+                    seen_movetexts.add(movetext_hash)
+                    # Fără comentarii {...} - zecimalele din adnotări nu sunt
+                    # numere de mutare
+                    move_numbers = _PGN_MOVE_NUMBER_RE.findall(
+                        _PGN_COMMENT_RE.sub(b' ', movetext))
+                    if move_numbers:
+                        last_move_number = int(move_numbers[-1])
+                        # Ultimul număr de mutare N => 2N-1 sau 2N semimutări
+                        if last_move_number < 2 or 2 * last_move_number - 1 > max_moves:
+                            continue
+                    # Parsează jocul din string; decodăm local, în worker
+                    game_string = game_string.decode('utf-8', errors='ignore')
+                # Visitor-ul captează mutările chiar în timpul parsării:
+                # fără arbore de noduri Game și fără a doua derulare a tablei
+                visitor = chess.pgn.read_game(io.StringIO(game_string), Visitor=_MoveCollectorVisitor)
+                if visitor is None:
                     continue
-                
-                moves = list(game.mainline_moves())
+
+                moves = visitor.moves
                 if not (4 <= len(moves) <= max_moves):
                     continue
-                
-                # Reconstruim tabla și notația SAN
+
+                # Pasul ieftin: push fără SAN, doar ca să testăm poziția finală
                 board = chess.Board()
-                san_moves = []
                 for move in moves:
-                    san_moves.append(board.san(move))
                     board.push(move)
-                
-                # Verificare strictă pentru mat
-                if not board.is_checkmate() or not san_moves[-1].endswith('#'):
+                if not board.is_checkmate():
                     continue
-                
+
+                # Doar supraviețuitorii plătesc generarea SAN (dezambiguizarea)
+                board = chess.Board()
+                san_moves = [board.san_and_push(move) for move in moves]
+
                 # Determinăm culoarea câștigătoare
                 num_moves = len(san_moves)
                 trap_color = chess.WHITE if (num_moves % 2 != 0) else chess.BLACK
-                
-                trap_name = game.headers.get("Event", f"Imported Trap") + " (Checkmate)"
+
+                trap_name = visitor.headers.get("Event", f"Imported Trap") + " (Checkmate)"
                 trap = ChessTrap(name=trap_name, moves=san_moves, color=trap_color)
                 
                 if trap_color == chess.WHITE:
@@ -1069,38 +1996,50 @@ class DatabaseAuditor:
     def __init__(self, repository: TrapRepository):
         self.repository = repository
 
-    def run_audit(self, max_moves: int) -> Tuple[str, bool]:
+    def run_audit(self, max_moves: int, progress_callback=None,
+                  should_cancel=None) -> Tuple[str, bool, List[int], List[Tuple[bool, int]]]:
         """
-        Runs all audit checks and returns a summary report and a boolean
-        indicating if any changes were made to the database.
+        Runs all audit checks and returns a summary report, a boolean
+        indicating if any changes were made to the database, plus the
+        exact delta (removed trap ids and (color, id) recolor pairs) so
+        the caller can patch its indexes instead of rebuilding them.
+
+        `progress_callback(done, total)` is invoked every 1000 traps and
+        `should_cancel()` is polled at the same cadence; a cancelled run
+        returns before touching the database, so it never leaves a
+        partial cleanup behind.
         """
         print("[AUDIT] Starting database audit...")
         start_time = time.time()
-        
+
         # Flag pentru a urmări dacă facem vreo modificare
         changes_made = False
-        
+
         all_traps = self.repository.get_all_traps()
         if not all_traps:
-            return "Audit Complete: The database is empty.", False
+            return "Audit Complete: The database is empty.", False, [], []
 
-        # ... (logica de a găsi duplicate, color_updates, etc. rămâne identică) ...
+        # Un singur pas peste capcane: duplicat / '#' / culoare / lungime.
+        # Semnătura e tuplul de mutări direct - hash C-level, fără json.dumps
         seen_signatures = set()
         duplicate_ids = []
-        for trap in all_traps:
-            signature = (json.dumps(trap.moves), trap.color)
-            if signature in seen_signatures:
-                duplicate_ids.append(trap.id)
-            else:
-                seen_signatures.add(signature)
-        
         color_updates = []
         no_checkmate_ids = []
         too_long_ids = []
-        
-        for trap in all_traps:
-            if trap.id in duplicate_ids:
+
+        total = len(all_traps)
+        for i, trap in enumerate(all_traps):
+            if i % 1000 == 0:
+                if should_cancel is not None and should_cancel():
+                    print(f"[AUDIT] Cancelled after scanning {i}/{total} traps.")
+                    return "Audit cancelled. No changes were made.", False, [], []
+                if progress_callback is not None:
+                    progress_callback(i, total)
+            signature = (tuple(trap.moves), trap.color)
+            if signature in seen_signatures:
+                duplicate_ids.append(trap.id)
                 continue
+            seen_signatures.add(signature)
             if not trap.moves or not trap.moves[-1].endswith('#'):
                 no_checkmate_ids.append(trap.id)
                 continue
@@ -1111,9 +2050,16 @@ class DatabaseAuditor:
             if num_moves > max_moves:
                 too_long_ids.append(trap.id)
 
+        # Ultimul punct de anulare, înainte de orice scriere în DB
+        if should_cancel is not None and should_cancel():
+            print("[AUDIT] Cancelled before applying changes.")
+            return "Audit cancelled. No changes were made.", False, [], []
+        if progress_callback is not None:
+            progress_callback(total, total)
+
         # --- Perform Database Operations ---
         all_ids_to_delete = set(duplicate_ids) | set(no_checkmate_ids) | set(too_long_ids)
-        
+
         if all_ids_to_delete:
             print(f"[AUDIT] Deleting {len(all_ids_to_delete)} invalid or duplicate traps.")
             self.repository.delete_traps_by_ids(list(all_ids_to_delete))
@@ -1137,7 +2083,7 @@ class DatabaseAuditor:
             f"Total entries removed: {len(all_ids_to_delete)}\n"
             f"Database was modified: {'Yes' if changes_made else 'No'}"
         )
-        return report, changes_made
+        return report, changes_made, list(all_ids_to_delete), color_updates
 
 class OpeningDatabase:
     """Bază de date hibridă pentru deschideri, cu logging inteligent."""
@@ -1150,6 +2096,9 @@ class OpeningDatabase:
         self.last_black_desc = ""
         self.last_theory = ""
         # -------------------------------------------
+        # Clasificarea e deterministă per poziție + istoric de mutări, iar
+        # funcția rulează la fiecare mutare/undo - memorăm rezultatul
+        self._phase_cache: Dict[Tuple[int, Tuple[str, ...]], Tuple[str, str, Optional[str]]] = {}
         
         if os.path.exists(self.db_path):
             try:
@@ -1161,14 +2110,11 @@ class OpeningDatabase:
                 print(f"[ERROR] Could not connect to opening book database: {e}")
 
     def _check_system_fingerprint(self, board: chess.Board, color: chess.Color) -> Optional[str]:
-        systems_for_color = SYSTEM_FINGERPRINTS.get(color, {})
-        for system_name, data in systems_for_color.items():
+        systems_for_color = _SYSTEM_FINGERPRINT_MASKS.get(color, {})
+        for system_name, masks in systems_for_color.items():
             all_pieces_in_place = all(
-                (piece_on_square := board.piece_at(square)) and
-                piece_on_square.piece_type == piece_type and
-                piece_on_square.color == color
-                for piece_type, squares in data["pieces"].items()
-                for square in squares
+                (board.pieces_mask(piece_type, color) & mask) == mask
+                for piece_type, mask in masks.items()
             )
             if all_pieces_in_place:
                 return system_name
@@ -1177,18 +2123,26 @@ class OpeningDatabase:
     def _get_opening_name_from_db(self, moves: List[str]) -> Optional[OpeningInfo]:
         if not self.conn or not moves: return None
         try:
+            # Un singur round-trip: toate prefixele într-o clauză IN, în loc de
+            # câte un query per lungime. Prefixul mai lung are mereu JSON-ul
+            # mai lung, deci ORDER BY length() alege cea mai adâncă potrivire.
+            prefixes = [json.dumps(moves[:length]) for length in range(1, len(moves) + 1)]
+            placeholders = ','.join('?' * len(prefixes))
             cursor = self.conn.cursor()
-            for length in range(len(moves), 0, -1):
-                moves_json = json.dumps(moves[:length])
-                cursor.execute("SELECT name, eco_code FROM openings WHERE moves_json = ?", (moves_json,))
-                if result := cursor.fetchone():
-                    return OpeningInfo(name=result[0], eco_code=result[1])
+            cursor.execute(
+                f"SELECT name, eco_code FROM openings WHERE moves_json IN ({placeholders}) "
+                "ORDER BY length(moves_json) DESC LIMIT 1",
+                prefixes
+            )
+            if result := cursor.fetchone():
+                return OpeningInfo(name=result[0], eco_code=result[1])
             return None
         except sqlite3.Error as e:
             print(f"[DB ERROR] Error querying opening book: {e}")
             return None
 
-    def get_opening_phase_info(self, board: chess.Board, moves: List[str]) -> Tuple[str, str]:
+    def get_opening_phase_info(self, board: chess.Board, moves: List[str],
+                               board_hash: Optional[int] = None) -> Tuple[str, str]:
         if not moves:
             # La începutul partidei, resetăm totul
             self.last_white_desc = "Starting Position"
@@ -1196,8 +2150,23 @@ class OpeningDatabase:
             self.last_theory = None
             return self.last_white_desc, self.last_black_desc
 
+        # Poziție deja clasificată (navigare, undo/redo)? Sărim peste
+        # fingerprint-uri și query-ul DB; doar sincronizăm starea de logging.
+        if board_hash is None:
+            board_hash = chess.polyglot.zobrist_hash(board)
+        cache_key = (board_hash, tuple(moves))
+        cached = self._phase_cache.get(cache_key)
+        if cached is not None:
+            final_white, final_black, theory_name = cached
+            if (final_white != self.last_white_desc or final_black != self.last_black_desc
+                    or theory_name != self.last_theory):
+                self.last_white_desc = final_white
+                self.last_black_desc = final_black
+                self.last_theory = theory_name
+            return final_white, final_black
+
         # Cine a făcut ultima mutare?
-        last_move_color = not board.turn 
+        last_move_color = not board.turn
 
         # 1. Detectăm întotdeauna sistemele
         white_system = self._check_system_fingerprint(board, chess.WHITE)
@@ -1256,6 +2225,7 @@ class OpeningDatabase:
             self.last_black_desc = final_black
             self.last_theory = theory_name
 
+        self._phase_cache[cache_key] = (final_white, final_black, theory_name)
         return final_white, final_black
 
     def get_total_openings(self) -> int:
@@ -1321,7 +2291,13 @@ class PieceImageLoader:
             chess.PAWN: 'p', chess.ROOK: 'r', chess.KNIGHT: 'n',
             chess.BISHOP: 'b', chess.QUEEN: 'q', chess.KING: 'k'
         }
-        
+
+        # Conversia la formatul de pixeli al display-ului se face o dată la
+        # încărcare; altfel SDL convertește per-pixel la fiecare blit.
+        # Cere un display existent - set_mode rulează înaintea loader-ului.
+        can_convert = pygame.display.get_surface() is not None
+
+
         for piece_type, symbol in piece_symbols.items():
             for color in [chess.WHITE, chess.BLACK]:
                 color_prefix = 'w' if color == chess.WHITE else 'b'
@@ -1332,14 +2308,18 @@ class PieceImageLoader:
                     image_path = os.path.join("pieces", filename)
                     if os.path.exists(image_path):
                         image = pygame.image.load(image_path)
+                        if can_convert:
+                            image = image.convert_alpha()
                         image = pygame.transform.scale(image, (self.square_size, self.square_size))
                         self.piece_images[(piece_type, color)] = image
                     else:
                         # Create placeholder if image not found
                         surface = pygame.Surface((self.square_size, self.square_size), pygame.SRCALPHA)
+                        if can_convert:
+                            surface = surface.convert_alpha()
                         color_rgb = (255, 255, 255) if color == chess.WHITE else (0, 0, 0)
-                        pygame.draw.circle(surface, color_rgb, 
-                                         (self.square_size//2, self.square_size//2), 
+                        pygame.draw.circle(surface, color_rgb,
+                                         (self.square_size//2, self.square_size//2),
                                          self.square_size//3)
                         self.piece_images[(piece_type, color)] = surface
                 
@@ -1349,10 +2329,20 @@ class PieceImageLoader:
                     surface = pygame.Surface((self.square_size, self.square_size))
                     surface.fill((255, 0, 0))  # Red placeholder
                     self.piece_images[(piece_type, color)] = surface
-    
+
+        # Indexare plată pe piece_type*2 + color: scutește alocarea unui tuplu
+        # și un hash de dicționar pentru fiecare piesă randată, la fiecare frame
+        self._flat_images: List[Optional[pygame.Surface]] = [None] * 14
+        for (piece_type, color), image in self.piece_images.items():
+            self._flat_images[piece_type * 2 + int(color)] = image
+
     def get_piece_image(self, piece: chess.Piece) -> pygame.Surface:
         """Get the image for a chess piece."""
-        return self.piece_images.get((piece.piece_type, piece.color))
+        return self._flat_images[piece.piece_type * 2 + piece.color]
+
+    def get_piece_image_fast(self, piece_type: int, color: chess.Color) -> pygame.Surface:
+        """Get a piece image by raw type and color, without a Piece object."""
+        return self._flat_images[piece_type * 2 + color]
 
 class InputHandler:
     """Handles user input events."""
@@ -1360,12 +2350,49 @@ class InputHandler:
     def __init__(self, config: UIConfig):
         self.config = config
     
-    def handle_button_click(self, pos: Tuple[int, int], button_rects: Dict[str, pygame.Rect]) -> Optional[str]:
-        """Handle button clicks and return action name."""
+    def handle_button_click(self, pos: Tuple[int, int], button_rects: Dict[str, pygame.Rect],
+                            y_index=None) -> Optional[str]:
+        """Handle button clicks and return action name.
+
+        Cu un y_index (vezi build_button_y_index) sărim direct la butoanele
+        care acoperă pos[1] prin căutare binară; fără index, scanarea
+        liniară rămâne fallback-ul.
+        """
+        if y_index is not None:
+            tops, entries, max_bottoms = y_index
+            y = pos[1]
+            # Candidatele au top <= y; mergem înapoi cât timp vreun buton
+            # de până aici poate încă ajunge sub y (prefixul de max-bottom)
+            i = bisect.bisect_right(tops, y) - 1
+            while i >= 0 and max_bottoms[i] > y:
+                _top, action, rect = entries[i]
+                if rect.collidepoint(pos):
+                    return action
+                i -= 1
+            return None
         for action, rect in button_rects.items():
             if rect.collidepoint(pos):
                 return action
         return None
+
+    @staticmethod
+    def build_button_y_index(button_rects: Dict[str, pygame.Rect]):
+        """Build a y-sorted index over button rects for binary-searched hit tests.
+
+        Returnează (tops, entries, max_bottoms): entries sortate după top,
+        tops ca listă separată pentru bisect, iar max_bottoms[i] = cel mai
+        jos bottom dintre entries[0..i] - limita de oprire la mersul înapoi.
+        """
+        entries = sorted(((rect.top, action, rect)
+                          for action, rect in button_rects.items()),
+                         key=operator.itemgetter(0))
+        tops = [e[0] for e in entries]
+        max_bottoms = []
+        running = 0
+        for _top, _action, rect in entries:
+            running = max(running, rect.bottom)
+            max_bottoms.append(running)
+        return tops, entries, max_bottoms
     
     def get_square_from_mouse(self, pos: Tuple[int, int], flipped: bool = False) -> Optional[chess.Square]:
         """Convert mouse position to chess square."""
@@ -1396,6 +2423,64 @@ class Renderer:
         self.font = pygame.font.Font(None, 32)
         self.small_font = pygame.font.Font(None, 24)
         self.large_font = pygame.font.Font(None, 48)
+        # Fontul mesajului de succes, creat o dată - Font(None, ...) redeschide
+        # fișierul fontului implicit la fiecare instanțiere
+        self.success_font = pygame.font.Font(None, 36)
+        # Metrici de font constante, citite o singură dată (fiecare apel
+        # get_height/size traversează granița SDL_ttf)
+        self._small_h = self.small_font.get_height()
+        self._small_space_w = self.small_font.size(' ')[0]
+        self._success_line_h = self.success_font.get_height() + 5
+
+        # Fundalul static al tablei (pătrățele + contur + coordonate) este
+        # fix per orientare - îl desenăm o dată și doar îl blit-uim per frame.
+        # Ambele orientări se construiesc la init, ca flip-ul tablei să nu
+        # plătească rasterizarea în mijlocul unui frame.
+        self._board_bg: Dict[bool, pygame.Surface] = {}
+        self._get_board_background(False)
+        self._get_board_background(True)
+        # Chrome-ul panoului de butoane, cache-uit pe (culoare, recording):
+        # butoanele și etichetele nu se schimbă decât când aceste stări se schimbă
+        self._panel_cache: Dict[Tuple[bool, bool],
+                                Tuple[pygame.Surface, Dict[str, pygame.Rect], pygame.Rect]] = {}
+        # Istoricul de mutări rasterizat, ținut până se schimbă istoricul
+        self._history_cache: Optional[Tuple[tuple, pygame.Surface]] = None
+        # Formatarea istoricului e incrementală: mutările doar se adaugă în
+        # timpul jocului, deci păstrăm părțile deja formatate și completăm
+        # numai coada nouă; navigarea înapoi invalidează prefixul și reia
+        self._history_fmt_src: Tuple[str, ...] = ()
+        self._history_fmt_parts: List[str] = []
+        # Pătrățele de highlight semitransparente, câte unul per culoare RGBA
+        self._highlight_cache: Dict[Tuple[int, ...], pygame.Surface] = {}
+        # Rânduri de sugestii gata randate (fundal + bordură + text);
+        # lista de sugestii stă neschimbată multe frame-uri la rând
+        self._sugg_row_cache: Dict[tuple, pygame.Surface] = {}
+        # Textele de status (deschiderile celor două perspective) se schimbă
+        # doar la mutare; ținem suprafețele și rect-urile gata calculate
+        self._status_cache_key: Optional[Tuple[str, str]] = None
+        self._status_cache_surfs: Optional[tuple] = None
+        # Bannerul RECORDING are text fix - se randează o singură dată
+        self._recording_banner: Optional[Tuple[pygame.Surface, pygame.Rect]] = None
+        # Coordonatele de ecran ale celor 8 coloane/rânduri, calculate o dată;
+        # buclele de randare doar indexează, fără înmulțiri per pătrat
+        self._x_pos: Tuple[int, ...] = tuple(
+            self.config.LEFT_MARGIN + i * self.config.SQUARE_SIZE for i in range(8))
+        self._y_pos: Tuple[int, ...] = tuple(
+            self.config.TOP_MARGIN + i * self.config.SQUARE_SIZE for i in range(8))
+        # Coordonata (x, y) a fiecărui pătrat 0-63, per orientare: buclele
+        # de piese/highlight fac o singură indexare, fără file/rank și
+        # fără branch pe flipped per pătrat
+        # sq & 7 = file, sq >> 3 = rank (un pătrat e rank*8 + file)
+        self._square_xy: Dict[bool, Tuple[Tuple[int, int], ...]] = {
+            flipped: tuple(
+                (self._x_pos[7 - (sq & 7) if flipped else sq & 7],
+                 self._y_pos[sq >> 3 if flipped else 7 - (sq >> 3)])
+                for sq in chess.SQUARES)
+            for flipped in (False, True)
+        }
+        # Geometria butoanelor din panoul stâng, calculată o singură dată;
+        # chrome-ul doar desenează peste aceste rect-uri fixe
+        self._static_button_layout: Dict[str, pygame.Rect] = self._build_button_layout()
     
     
     def render_game_screen(self, surface: pygame.Surface, state: GameState, 
@@ -1438,44 +2523,87 @@ class Renderer:
         
         return all_button_rects
     
-    def render_control_panel(self, surface: pygame.Surface, state: GameState, move_history: List[str]) -> Dict[str, pygame.Rect]:
-        """Render the main control panel with integrated functionality."""
+    def _build_button_layout(self) -> Dict[str, pygame.Rect]:
+        """Compute the fixed geometry of the left-panel buttons once.
+
+        Pozițiile nu depind de starea jocului - doar textul/culoarea unor
+        butoane se schimbă - așa că rect-urile se calculează la init, iar
+        chrome-ul și hit-testing-ul le refolosesc. "color_toggle" este
+        rect-ul comun pentru play_as_black/play_as_white.
+        """
+        layout: Dict[str, pygame.Rect] = {}
+        y_offset = 50  # sub titlul "Controls:"
+
+        button_width, button_height, spacing = 80, 35, 10
+        for i, action in enumerate(("one_back", "one_forward", "to_start", "to_end")):
+            col, row = i % 2, i // 2
+            layout[action] = pygame.Rect(20 + col * (button_width + spacing),
+                                         y_offset + row * (button_height + spacing),
+                                         button_width, button_height)
+        y_offset += 2 * (button_height + spacing) + 10
+
+        layout["color_toggle"] = pygame.Rect(20, y_offset, self.config.BUTTONS_WIDTH - 40, 35)
+        y_offset += 45
+
+        for action in ("record", "import_pgn", "db_info"):
+            layout[action] = pygame.Rect(20, y_offset, self.config.BUTTONS_WIDTH - 40, 35)
+            y_offset += 45
+
+        history_y_start = y_offset + 20
+        layout["history_panel"] = pygame.Rect(10, history_y_start, self.config.BUTTONS_WIDTH - 20,
+                                              self.config.HEIGHT - history_y_start - 20)
+        layout["copy_pgn"] = pygame.Rect(layout["history_panel"].centerx - 50,
+                                         layout["history_panel"].bottom - 35, 100, 25)
+        return layout
+
+    def _get_control_panel_chrome(self, state: GameState
+                                  ) -> Tuple[pygame.Surface, Dict[str, pygame.Rect], pygame.Rect]:
+        """Build (and cache) the static chrome of the left button panel.
+
+        Everything here - butoane, borduri, titluri - depends only on the
+        current player and the recording flag, so it is rasterized once
+        per (player, recording) pair; per frame it costs a single blit.
+        Returns the chrome surface, the button hit-rects and the history
+        panel rect the dynamic text is drawn into.
+        """
+        cache_key = (state.current_player, state.is_recording)
+        cached = self._panel_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        # convert_alpha: format nativ al display-ului, blit fără conversie per-pixel
+        panel = pygame.Surface((self.config.BUTTONS_WIDTH, self.config.HEIGHT), pygame.SRCALPHA).convert_alpha()
         button_rects = {}
-        
+
         panel_rect = pygame.Rect(0, 0, self.config.BUTTONS_WIDTH, self.config.HEIGHT)
-        pygame.draw.rect(surface, self.config.PANEL_COLOR, panel_rect)
-        pygame.draw.rect(surface, self.config.BORDER_COLOR, panel_rect, 2)
-        
-        y_offset = 10
+        pygame.draw.rect(panel, self.config.PANEL_COLOR, panel_rect)
+        pygame.draw.rect(panel, self.config.BORDER_COLOR, panel_rect, 2)
+
+        layout = self._static_button_layout
         title_surface = self.font.render("Controls:", True, self.config.TEXT_COLOR)
-        surface.blit(title_surface, (10, y_offset))
-        y_offset += 40
+        panel.blit(title_surface, (10, 10))
 
-        # Butoanele de navigație rămân la fel
+        # Butoanele de navigație rămân la fel; geometria vine din layout
         nav_buttons = [("<", "one_back"), (">", "one_forward"), ("|<", "to_start"), (">|", "to_end")]
-        button_width, button_height, spacing = 80, 35, 10
-        for i, (text, action) in enumerate(nav_buttons):
-            col, row = i % 2, i // 2
-            rect = pygame.Rect(20 + col * (button_width + spacing), y_offset + row * (button_height + spacing), button_width, button_height)
-            pygame.draw.rect(surface, self.config.BUTTON_COLOR, rect, border_radius=3)
-            pygame.draw.rect(surface, self.config.BORDER_COLOR, rect, 1, border_radius=3)
+        for text, action in nav_buttons:
+            rect = layout[action]
+            pygame.draw.rect(panel, self.config.BUTTON_COLOR, rect, border_radius=3)
+            pygame.draw.rect(panel, self.config.BORDER_COLOR, rect, 1, border_radius=3)
             text_surf = self.small_font.render(text, True, self.config.TEXT_COLOR)
-            surface.blit(text_surf, text_surf.get_rect(center=rect.center))
+            panel.blit(text_surf, text_surf.get_rect(center=rect.center))
             button_rects[action] = rect
-        y_offset += 2 * (button_height + spacing) + 10
 
         # Butonul contextual pentru schimbarea culorii
         if state.current_player == chess.WHITE:
             text, action = "Play as Black", "play_as_black"
         else:
             text, action = "Play as White", "play_as_white"
-        
-        rect = pygame.Rect(20, y_offset, self.config.BUTTONS_WIDTH - 40, 35)
-        pygame.draw.rect(surface, (100, 100, 100), rect, border_radius=3)
+
+        rect = layout["color_toggle"]
+        pygame.draw.rect(panel, (100, 100, 100), rect, border_radius=3)
         text_surf = self.small_font.render(text, True, self.config.TEXT_COLOR)
-        surface.blit(text_surf, text_surf.get_rect(center=rect.center))
+        panel.blit(text_surf, text_surf.get_rect(center=rect.center))
         button_rects[action] = rect
-        y_offset += 45
 
         # Butoane de acțiune principale (FĂRĂ "Reset Game")
         action_buttons = [
@@ -1484,142 +2612,217 @@ class Renderer:
             ("Database Info", "db_info", (0, 80, 120)),
         ]
         for text, action, color in action_buttons:
-            rect = pygame.Rect(20, y_offset, self.config.BUTTONS_WIDTH - 40, 35)
+            rect = layout[action]
             # Logica pentru schimbarea textului butonului "record" rămâne
             if action == "record" and state.is_recording:
                 color, text = (180, 0, 0), "Confirm/Stop"
-            pygame.draw.rect(surface, color, rect, border_radius=3)
+            pygame.draw.rect(panel, color, rect, border_radius=3)
             text_surf = self.small_font.render(text, True, self.config.TEXT_COLOR)
-            surface.blit(text_surf, text_surf.get_rect(center=rect.center))
+            panel.blit(text_surf, text_surf.get_rect(center=rect.center))
             button_rects[action] = rect
-            y_offset += 45
 
         # Panoul de Istoric (rămâne neschimbat)
-        history_y_start = y_offset + 20
-        history_panel_rect = pygame.Rect(10, history_y_start, self.config.BUTTONS_WIDTH - 20, self.config.HEIGHT - history_y_start - 20)
-        pygame.draw.rect(surface, (40, 40, 40), history_panel_rect, border_radius=5)
-        pygame.draw.rect(surface, self.config.BORDER_COLOR, history_panel_rect, 1, border_radius=5)
+        history_panel_rect = layout["history_panel"]
+        pygame.draw.rect(panel, (40, 40, 40), history_panel_rect, border_radius=5)
+        pygame.draw.rect(panel, self.config.BORDER_COLOR, history_panel_rect, 1, border_radius=5)
 
         history_title_surf = self.small_font.render("Move History:", True, (200, 200, 200))
-        surface.blit(history_title_surf, (history_panel_rect.x + 10, history_panel_rect.y + 10))
+        panel.blit(history_title_surf, (history_panel_rect.x + 10, history_panel_rect.y + 10))
 
-        history_text = ""
-        for i, move in enumerate(move_history):
-            if i % 2 == 0:
-                history_text += f"{i//2 + 1}. {move} "
-            else:
-                history_text += f"{move} "
-        
-        def draw_text_wrapped(surf, text, font, color, rect):
-            words = text.split(' ')
-            lines = []
-            current_line = ""
-            for word in words:
-                if font.size(current_line + word)[0] < rect.width - 20:
-                    current_line += word + " "
-                else:
-                    lines.append(current_line)
-                    current_line = word + " "
-            lines.append(current_line)
-            
-            y_text_offset = rect.y + 35
-            for line in lines:
-                if y_text_offset + font.get_height() > rect.y + rect.height - 45:
-                    break
-                line_surf = font.render(line, True, color)
-                surf.blit(line_surf, (rect.x + 10, y_text_offset))
-                y_text_offset += font.get_height()
-                
-        draw_text_wrapped(surface, history_text.strip(), self.small_font, self.config.TEXT_COLOR, history_panel_rect)
-        
-        copy_button_rect = pygame.Rect(history_panel_rect.centerx - 50, history_panel_rect.bottom - 35, 100, 25)
-        pygame.draw.rect(surface, (80, 80, 150), copy_button_rect, border_radius=5)
+        copy_button_rect = layout["copy_pgn"]
+        pygame.draw.rect(panel, (80, 80, 150), copy_button_rect, border_radius=5)
         copy_text_surf = self.small_font.render("Copy PGN", True, self.config.TEXT_COLOR)
-        surface.blit(copy_text_surf, copy_text_surf.get_rect(center=copy_button_rect.center))
+        panel.blit(copy_text_surf, copy_text_surf.get_rect(center=copy_button_rect.center))
         button_rects["copy_pgn"] = copy_button_rect
-        
-        return button_rects
-        
-    def render_board(self, surface: pygame.Surface, state: GameState, flipped: bool = False) -> None:
-        """Render the chess board and highlights."""
+
+        self._panel_cache[cache_key] = (panel, button_rects, history_panel_rect)
+        return self._panel_cache[cache_key]
+
+    def render_control_panel(self, surface: pygame.Surface, state: GameState, move_history: List[str]) -> Dict[str, pygame.Rect]:
+        """Render the main control panel with integrated functionality."""
+        # Chrome-ul static vine din cache; doar istoricul se desenează per frame
+        chrome, button_rects, history_panel_rect = self._get_control_panel_chrome(state)
+        surface.blit(chrome, (0, 0))
+
+        history_surf = self._get_history_surface(tuple(move_history), history_panel_rect)
+        surface.blit(history_surf, (history_panel_rect.x, history_panel_rect.y))
+
+        return dict(button_rects)
+
+    def get_history_text(self, move_history: Tuple[str, ...]) -> str:
+        """Return the numbered PGN-style history string, formatted incrementally.
+
+        Dacă istoricul e o extensie a celui deja formatat, adăugăm doar
+        coada; altfel (navigare înapoi) o luăm de la zero. Join-ul rămâne
+        O(n), dar f-string-urile per mutare se plătesc o singură dată.
+        Folosit și de panoul de istoric, și de acțiunea copy_pgn.
+        """
+        parts = self._history_fmt_parts
+        prev_len = len(self._history_fmt_src)
+        if not (len(move_history) >= prev_len
+                and move_history[:prev_len] == self._history_fmt_src):
+            parts = self._history_fmt_parts = []
+            prev_len = 0
+        for i in range(prev_len, len(move_history)):
+            move = move_history[i]
+            if i % 2 == 0:
+                parts.append(f"{i//2 + 1}. {move}")
+            else:
+                parts.append(move)
+        self._history_fmt_src = move_history
+        return " ".join(parts)
+
+    def _get_history_surface(self, move_history: Tuple[str, ...],
+                             rect: pygame.Rect) -> pygame.Surface:
+        """Wrap and rasterize the move history, cached until a move changes.
+
+        Word-wrapping calls font.size per word and font.render per line;
+        doing that at every frame for an unchanged history is wasted work,
+        so the finished transparent surface is kept until the history (or
+        the panel geometry) differs.
+        """
+        cache_key = (move_history, rect.width, rect.height)
+        if self._history_cache is not None and self._history_cache[0] == cache_key:
+            return self._history_cache[1]
+
+        history_text = self.get_history_text(move_history)
+
+        font = self.small_font
+        words = history_text.split(' ')
+        # Măsurăm fiecare cuvânt o singură dată și ținem lățimea cumulată;
+        # font.size(linie + cuvânt) re-măsura toată linia la fiecare candidat
+        space_width = self._small_space_w
+        max_width = rect.width - 20
+        lines = []
+        current_words: List[str] = []
+        current_width = 0
+        for word in words:
+            word_width = font.size(word)[0]
+            if current_words and current_width + word_width >= max_width:
+                lines.append(' '.join(current_words))
+                current_words = [word]
+                current_width = word_width + space_width
+            else:
+                current_words.append(word)
+                current_width += word_width + space_width
+        lines.append(' '.join(current_words))
+
+        text_surface = pygame.Surface((rect.width, rect.height), pygame.SRCALPHA).convert_alpha()
+        line_height = self._small_h
+        y_text_offset = 35
+        for line in lines:
+            if y_text_offset + line_height > rect.height - 45:
+                break
+            line_surf = font.render(line, True, self.config.TEXT_COLOR)
+            text_surface.blit(line_surf, (10, y_text_offset))
+            y_text_offset += line_height
+
+        self._history_cache = (cache_key, text_surface)
+        return text_surface
+        
+    def _get_highlight(self, color: Tuple[int, ...]) -> pygame.Surface:
+        """Returns the cached semi-transparent square for an RGBA color.
+
+        The highlight squares never change size, so allocating and
+        filling a fresh SRCALPHA surface per square per frame is pure
+        overhead; one surface per distinct color suffices.
+        """
+        key = tuple(color)
+        cached = self._highlight_cache.get(key)
+        if cached is None:
+            cached = pygame.Surface((self.config.SQUARE_SIZE, self.config.SQUARE_SIZE), pygame.SRCALPHA).convert_alpha()
+            cached.fill(color)
+            self._highlight_cache[key] = cached
+        return cached
+
+    def _get_board_background(self, flipped: bool) -> pygame.Surface:
+        """Build (once per orientation) the static board background.
+
+        The 64 squares, the border and the file/rank coordinates never
+        change between frames, so they are rendered to an off-screen
+        surface and re-used; render_board only blits it and draws the
+        dynamic highlights on top.
+        """
+        cached = self._board_bg.get(flipped)
+        if cached is not None:
+            return cached
+
+        # convert_alpha: format nativ al display-ului, blit fără conversie per-pixel
+        bg = pygame.Surface((self.config.WIDTH, self.config.HEIGHT), pygame.SRCALPHA).convert_alpha()
+
         # Desenarea pătrățelelor
         for row in range(8):
             for col in range(8):
                 x = self.config.LEFT_MARGIN + col * self.config.SQUARE_SIZE
                 y = self.config.TOP_MARGIN + row * self.config.SQUARE_SIZE
                 color = self.config.LIGHT_SQUARE if (row + col) % 2 == 0 else self.config.DARK_SQUARE
-                pygame.draw.rect(surface, color, pygame.Rect(x, y, self.config.SQUARE_SIZE, self.config.SQUARE_SIZE))
-        
-        # Desenarea highlight-ului
-        if state.highlighted_squares and state.highlight_color:
-            from_sq, to_sq = state.highlighted_squares
-            for sq in [from_sq, to_sq]:
-                col_logic = chess.square_file(sq)
-                row_logic = chess.square_rank(sq)
-                
-                # --- AICI ESTE CORECȚIA ESENȚIALĂ ---
-                # Coordonata X (coloana) depinde de 'flipped'
-                col_screen = 7 - col_logic if flipped else col_logic
-                # Coordonata Y (rândul) este MEREU inversată față de logică,
-                # DAR depinde și de 'flipped'
-                row_screen = row_logic if flipped else 7 - row_logic
-                
-                x = self.config.LEFT_MARGIN + col_screen * self.config.SQUARE_SIZE
-                y = self.config.TOP_MARGIN + row_screen * self.config.SQUARE_SIZE
-                
-                highlight_surface = pygame.Surface((self.config.SQUARE_SIZE, self.config.SQUARE_SIZE), pygame.SRCALPHA)
-                highlight_surface.fill(state.highlight_color)
-                surface.blit(highlight_surface, (x, y))
+                pygame.draw.rect(bg, color, pygame.Rect(x, y, self.config.SQUARE_SIZE, self.config.SQUARE_SIZE))
 
         # Desenarea conturului și a coordonatelor
         board_rect = pygame.Rect(self.config.LEFT_MARGIN, self.config.TOP_MARGIN, self.config.BOARD_SIZE, self.config.BOARD_SIZE)
-        pygame.draw.rect(surface, self.config.BORDER_COLOR, board_rect, 3)
+        pygame.draw.rect(bg, self.config.BORDER_COLOR, board_rect, 3)
         for i in range(8):
             file_letter = chr(ord('a') + (7 - i if flipped else i))
             file_surface = self.small_font.render(file_letter, True, self.config.TEXT_COLOR)
             file_x = self.config.LEFT_MARGIN + i * self.config.SQUARE_SIZE + self.config.SQUARE_SIZE // 2 - file_surface.get_width() // 2
             file_y = self.config.TOP_MARGIN + self.config.BOARD_SIZE + 10
-            surface.blit(file_surface, (file_x, file_y))
-            
+            bg.blit(file_surface, (file_x, file_y))
+
             rank_number = str(i + 1 if flipped else 8 - i)
             rank_surface = self.small_font.render(rank_number, True, self.config.TEXT_COLOR)
             rank_x = self.config.LEFT_MARGIN - 20 - rank_surface.get_width()
             rank_y = self.config.TOP_MARGIN + i * self.config.SQUARE_SIZE + self.config.SQUARE_SIZE // 2 - rank_surface.get_height() // 2
-            surface.blit(rank_surface, (rank_x, rank_y))
+            bg.blit(rank_surface, (rank_x, rank_y))
+
+        self._board_bg[flipped] = bg
+        return bg
+
+    def render_board(self, surface: pygame.Surface, state: GameState, flipped: bool = False) -> None:
+        """Render the chess board and highlights."""
+        # Fundalul static pre-randat: un singur blit în loc de 64+ draw-uri
+        surface.blit(self._get_board_background(flipped), (0, 0))
+
+        # Desenarea highlight-ului
+        if state.highlighted_squares and state.highlight_color:
+            from_sq, to_sq = state.highlighted_squares
+            # Maparea pătrat -> pixel e precalculată per orientare
+            square_xy = self._square_xy[flipped]
+            for sq in [from_sq, to_sq]:
+                surface.blit(self._get_highlight(state.highlight_color), square_xy[sq])
 
-        
     def render_pieces(self, surface: pygame.Surface, board: chess.Board, 
                      piece_loader: PieceImageLoader, selected_square: Optional[chess.Square] = None,
                      flipped: bool = False, dragging_piece: Optional[chess.Piece] = None,
                      drag_pos: Optional[Tuple[int, int]] = None) -> None:
         """Render chess pieces on the board."""
-        for r_logic in range(8):
-            for c_logic in range(8):
-                # --- CORECȚIE APLICATĂ ȘI AICI PENTRU CONSISTENȚĂ ---
-                col_screen = 7 - c_logic if flipped else c_logic
-                row_screen = r_logic if flipped else 7 - r_logic
-                
-                square = chess.square(c_logic, r_logic)
-                piece = board.piece_at(square)
-                
-                if piece and square == selected_square and dragging_piece:
-                    continue
-                
-                if piece:
-                    piece_image = piece_loader.get_piece_image(piece)
-                    if piece_image:
-                        x = self.config.LEFT_MARGIN + col_screen * self.config.SQUARE_SIZE
-                        y = self.config.TOP_MARGIN + row_screen * self.config.SQUARE_SIZE
-                        
-                        if square == selected_square and not dragging_piece:
-                            highlight_surface = pygame.Surface((self.config.SQUARE_SIZE, self.config.SQUARE_SIZE), pygame.SRCALPHA)
-                            highlight_surface.fill((255, 255, 0, 100))
-                            surface.blit(highlight_surface, (x, y))
-                        
-                        surface.blit(piece_image, (x, y))
-        
+        get_image = piece_loader.get_piece_image_fast
+        # Strângem piesele într-o listă și le trimitem dintr-un singur apel
+        # fblits (FASTCALL, fără parsing de flag-uri per blit)
+        draw_list = []
+        # Maparea pătrat -> pixel e precalculată per orientare
+        square_xy = self._square_xy[flipped]
+        # piece_map() întoarce doar pătratele ocupate - ~32 iterații în loc
+        # de 64 de apeluri piece_at()
+        for square, piece in board.piece_map().items():
+            if square == selected_square and dragging_piece:
+                continue
+
+            piece_image = get_image(piece.piece_type, piece.color)
+            if piece_image:
+                xy = square_xy[square]
+
+                if square == selected_square and not dragging_piece:
+                    surface.blit(self._get_highlight((255, 255, 0, 100)), xy)
+
+                draw_list.append((piece_image, xy))
+
+        if draw_list:
+            # blits() rămâne fallback pentru pygame-uri mai vechi, fără fblits
+            blit_batch = getattr(surface, 'fblits', surface.blits)
+            blit_batch(draw_list)
+
         if dragging_piece and drag_pos:
-            piece_image = piece_loader.get_piece_image(dragging_piece)
+            piece_image = get_image(dragging_piece.piece_type, dragging_piece.color)
             if piece_image:
                 drag_x = drag_pos[0] - self.config.SQUARE_SIZE // 2
                 drag_y = drag_pos[1] - self.config.SQUARE_SIZE // 2
@@ -1644,8 +2847,8 @@ class Renderer:
             
             # Desenăm mesajul de succes pe mai multe linii
             lines = state.trap_success_message.split('\n')
-            success_font = pygame.font.Font(None, 36)
-            line_height = success_font.get_height() + 5
+            success_font = self.success_font
+            line_height = self._success_line_h
 
             for i, line in enumerate(lines):
                 success_surface = success_font.render(line, True, (100, 255, 100)) # Verde deschis
@@ -1658,7 +2861,7 @@ class Renderer:
         surface.blit(title_surface, (panel_rect.x + 10, y_offset))
         y_offset += 40
         
-        traps_formatted = f"{total_matching_traps:_}".replace("_", " ")
+        traps_formatted = _format_thousands(total_matching_traps)
         count_text = f"Matching traps found: {traps_formatted}"
         count_surface = self.small_font.render(count_text, True, (255, 255, 0))
         surface.blit(count_surface, (panel_rect.x + 10, y_offset))
@@ -1675,14 +2878,8 @@ class Renderer:
                 suggestion_y = suggestions_area.y + i * suggestion_height
                 suggestion_rect_rel = pygame.Rect(5, 5, suggestions_area.width - 10, suggestion_height - 10)
                 suggestion_rect_abs = suggestion_rect_rel.move(suggestions_area.x, suggestion_y)
-                bg_color = self.config.SUGGESTION_PURPLE if suggestion.trap_type == 'queen_hunter' else self.config.SUGGESTION_BLUE
-                prefix = "[Queen Hunter] " if suggestion.trap_type == 'queen_hunter' else ""
-                pygame.draw.rect(surface, bg_color, suggestion_rect_abs)
-                pygame.draw.rect(surface, self.config.BORDER_COLOR, suggestion_rect_abs, 1)
-                trap_count_formatted = f"{suggestion.trap_count:_}".replace("_", " ")
-                suggestion_text = f"{prefix}{suggestion.suggested_move} (in {trap_count_formatted} trap lines)"
-                text_surface = self.small_font.render(suggestion_text, True, self.config.TEXT_COLOR)
-                surface.blit(text_surface, (suggestion_rect_abs.x + 10, suggestion_rect_abs.y + 10))
+                row_surface = self._get_suggestion_row(suggestion, suggestion_rect_abs.size)
+                surface.blit(row_surface, suggestion_rect_abs.topleft)
                 button_rects[f"suggestion_{i}"] = suggestion_rect_abs
         else:
             no_suggestions = self.small_font.render("No available traps for this line", True, (150, 150, 150))
@@ -1691,31 +2888,75 @@ class Renderer:
                 
         return button_rects
     
+    def _get_suggestion_row(self, suggestion: MoveSuggestion,
+                            size: Tuple[int, int]) -> pygame.Surface:
+        """Returns the fully rendered row for a suggestion, from cache.
+
+        A row (colored background, border, label text) depends only on
+        the suggestion's move, count and type, and the list sits
+        unchanged for many frames while the user thinks - so each
+        distinct row is rasterized once instead of every frame.
+        """
+        cache_key = (suggestion.trap_type, suggestion.suggested_move,
+                     suggestion.trap_count, size)
+        cached = self._sugg_row_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        # Plafonăm cache-ul ca să nu crească nelimitat peste o sesiune lungă
+        if len(self._sugg_row_cache) > 256:
+            self._sugg_row_cache.clear()
+
+        bg_color = self.config.SUGGESTION_PURPLE if suggestion.trap_type == 'queen_hunter' else self.config.SUGGESTION_BLUE
+        prefix = "[Queen Hunter] " if suggestion.trap_type == 'queen_hunter' else ""
+        # Rând opac - convert() simplu e suficient și mai ieftin la blit
+        row = pygame.Surface(size).convert()
+        row.fill(bg_color)
+        pygame.draw.rect(row, self.config.BORDER_COLOR, pygame.Rect((0, 0), size), 1)
+        trap_count_formatted = _format_thousands(suggestion.trap_count)
+        suggestion_text = f"{prefix}{suggestion.suggested_move} (in {trap_count_formatted} trap lines)"
+        text_surface = self.small_font.render(suggestion_text, True, self.config.TEXT_COLOR)
+        row.blit(text_surface, (10, 10))
+
+        self._sugg_row_cache[cache_key] = row
+        return row
+
     def render_status(self, surface: pygame.Surface, state: GameState, white_info: str, black_info: str) -> None:
-        """Render game status information including opening name from both perspectives."""
-        
-        # Stabilește culoarea textului pentru fiecare parte
-        white_text_color = (255, 255, 255)
-        black_text_color = (220, 220, 220)
-        
-        # Perspectiva JOS (de obicei albul)
-        bottom_y = self.config.TOP_MARGIN + self.config.BOARD_SIZE + 45
-        bottom_perspective_text = f"♔ {white_info}"
-        bottom_surface = self.font.render(bottom_perspective_text, True, white_text_color)
-        bottom_rect = bottom_surface.get_rect(center=(self.config.LEFT_MARGIN + self.config.BOARD_SIZE // 2, bottom_y))
-        
-        # Fundal pentru contrast jos
-        bg_rect_bottom = bottom_rect.inflate(20, 10)
-        
-        # Perspectiva SUS (de obicei negrul)
-        top_y = self.config.TOP_MARGIN - 30
-        top_perspective_text = f"♛ {black_info}"
-        top_surface = self.font.render(top_perspective_text, True, black_text_color)
-        top_rect = top_surface.get_rect(center=(self.config.LEFT_MARGIN + self.config.BOARD_SIZE // 2, top_y))
-        
-        # Fundal pentru contrast sus
-        bg_rect_top = top_rect.inflate(20, 10)
-        
+        """Render game status information including opening name from both perspectives.
+
+        Suprafețele de text și rect-urile de fundal (inclusiv inflate-ul)
+        se recalculează doar când se schimbă perechea de texte; per frame
+        se re-selectează doar care fundal primește chenarul de highlight,
+        în funcție de board.turn.
+        """
+
+        # Textele de deschidere se schimbă doar la mutare - re-randăm
+        # suprafețele doar când se schimbă perechea de stringuri
+        cache_key = (white_info, black_info)
+        if self._status_cache_key != cache_key:
+            white_text_color = (255, 255, 255)
+            black_text_color = (220, 220, 220)
+
+            # Perspectiva JOS (de obicei albul)
+            bottom_y = self.config.TOP_MARGIN + self.config.BOARD_SIZE + 45
+            bottom_perspective_text = f"♔ {white_info}"
+            bottom_surface = self.font.render(bottom_perspective_text, True, white_text_color)
+            bottom_rect = bottom_surface.get_rect(center=(self.config.LEFT_MARGIN + self.config.BOARD_SIZE // 2, bottom_y))
+
+            # Perspectiva SUS (de obicei negrul)
+            top_y = self.config.TOP_MARGIN - 30
+            top_perspective_text = f"♛ {black_info}"
+            top_surface = self.font.render(top_perspective_text, True, black_text_color)
+            top_rect = top_surface.get_rect(center=(self.config.LEFT_MARGIN + self.config.BOARD_SIZE // 2, top_y))
+
+            # Fundalurile pentru contrast, calculate o dată cu textul
+            self._status_cache_key = cache_key
+            self._status_cache_surfs = (bottom_surface, bottom_rect, bottom_rect.inflate(20, 10),
+                                        top_surface, top_rect, top_rect.inflate(20, 10))
+
+        (bottom_surface, bottom_rect, bg_rect_bottom,
+         top_surface, top_rect, bg_rect_top) = self._status_cache_surfs
+
         # Desenează fundalurile
         pygame.draw.rect(surface, (40, 40, 40), bg_rect_bottom, border_radius=5)
         pygame.draw.rect(surface, (40, 40, 40), bg_rect_top, border_radius=5)
@@ -1731,12 +2972,34 @@ class Renderer:
         else:
             pygame.draw.rect(surface, highlight_color, bg_rect_top, 2, border_radius=5)
         
-        # Textul RECORDING (dacă este cazul)
+        # Textul RECORDING (dacă este cazul) - text fix, randat o singură dată
         if state.is_recording:
-            record_text = "RECORDING - Type trap name and press Enter"
-            record_surface = self.small_font.render(record_text, True, (255, 100, 100))
-            record_rect = record_surface.get_rect(centerx=self.config.LEFT_MARGIN + self.config.BOARD_SIZE // 2, y=5)
-            surface.blit(record_surface, record_rect)
+            if self._recording_banner is None:
+                record_text = "RECORDING - Type trap name and press Enter"
+                record_surface = self.small_font.render(record_text, True, (255, 100, 100))
+                record_rect = record_surface.get_rect(centerx=self.config.LEFT_MARGIN + self.config.BOARD_SIZE // 2, y=5)
+                self._recording_banner = (record_surface, record_rect)
+            surface.blit(*self._recording_banner)
+
+    def present(self, dirty_rects: Optional[List[pygame.Rect]] = None) -> None:
+        """Push the frame to the display, choosing flip vs partial update.
+
+        display.update cu multe rect-uri mici plătește overhead per rect,
+        deci partial update merită doar când zona murdară e cu adevărat
+        mică: peste ~25% din fereastră sau peste 20 de rect-uri, flip()
+        e mai ieftin. Bucla principală repictează azi întreaga fereastră
+        (fill + blit-uri full-screen), deci trece None și primește flip;
+        un apelant care chiar urmărește rect-uri murdare poate trece lista.
+        """
+        if not dirty_rects:
+            pygame.display.flip()
+            return
+        if (len(dirty_rects) > 20
+                or sum(r.w * r.h for r in dirty_rects)
+                > 0.25 * self.config.WIDTH * self.config.HEIGHT):
+            pygame.display.flip()
+        else:
+            pygame.display.update(dirty_rects)
 
     
 if QT_AVAILABLE:
@@ -1810,10 +3073,10 @@ if QT_AVAILABLE:
             
             group_box = QGroupBox("Recorded Moves")
             group_layout = QVBoxLayout()
-            moves_text = ""
-            for i, move in enumerate(moves_san):
-                moves_text += f"{i//2 + 1}. {move} " if i % 2 == 0 else f"{move} "
-            moves_label = QLabel(moves_text.strip())
+            moves_text = " ".join(
+                f"{i//2 + 1}. {move}" if i % 2 == 0 else move
+                for i, move in enumerate(moves_san))
+            moves_label = QLabel(moves_text)
             moves_label.setWordWrap(True)
             group_layout.addWidget(moves_label)
             group_box.setLayout(group_layout)
@@ -2042,9 +3305,56 @@ if QT_AVAILABLE:
             self.on_start_import(self.full_filepath, max_moves, checkmate_only)
             self.accept()
 
+    class PgnImportWorker(QObject):
+        """Runs a PGN import on a worker QThread, reporting back via signals."""
+
+        progress = Signal(int)                # jocuri citite din fișier până acum
+        finished = Signal(int, int, object)   # (capcane albe, capcane negre, id-uri noi)
+
+        def __init__(self, pgn_service, filepath, max_moves, checkmate_only, parent=None):
+            super().__init__(parent)
+            self.pgn_service = pgn_service
+            self.filepath = filepath
+            self.max_moves = max_moves
+            self.checkmate_only = checkmate_only
+
+        def run(self):
+            white_count, black_count, added_ids = self.pgn_service.import_from_file(
+                self.filepath, self.max_moves, self.checkmate_only,
+                progress_callback=self.progress.emit)
+            self.finished.emit(white_count, black_count, added_ids)
+
+    class AuditWorker(QObject):
+        """Runs the database audit on a worker QThread, with cancel support."""
+
+        progress = Signal(int, int)                    # (capcane verificate, total)
+        finished = Signal(str, bool, object, object)   # (raport, modificat, șterse, recolorate)
+
+        def __init__(self, repository, max_moves, parent=None):
+            super().__init__(parent)
+            self.repository = repository
+            self.max_moves = max_moves
+            self._cancelled = False
+
+        def cancel(self):
+            # Scris de pe firul principal, citit de bucla de audit - un
+            # bool simplu e de ajuns, nu avem nevoie de lock pentru un flag
+            self._cancelled = True
+
+        def run(self):
+            auditor = DatabaseAuditor(self.repository)
+            results = auditor.run_audit(
+                self.max_moves,
+                progress_callback=self.progress.emit,
+                should_cancel=lambda: self._cancelled)
+            self.finished.emit(*results)
+
 # Main Game Controller
 class GameController:
     """Main controller that orchestrates the game."""
+
+    # Panoul de sugestii are loc pentru ~15 rânduri; nu sortăm mai mult de atât
+    MAX_SUGGESTIONS = 15
     
     def __init__(self):
         print("[DEBUG INIT] Initializing GameController...")
@@ -2066,6 +3376,15 @@ class GameController:
         self.queen_trap_service = QueenTrapService(self.queen_trap_repository)
         
         self.pgn_service = PGNImportService(self.trap_repository)
+        # Ținem referințe la thread-urile/worker-ii de import și audit cât
+        # timp rulează, altfel ar fi colectate de GC înainte să termine
+        self._import_thread = None
+        self._import_worker = None
+        self._audit_thread = None
+        self._audit_worker = None
+        # Dialogurile deschise cu open() (non-blocant) au nevoie de o
+        # referință Python cât sunt pe ecran, altfel GC le închide
+        self._active_dialog = None
         self.settings_service = SettingsService()
         self.opening_db = OpeningDatabase()
         
@@ -2078,24 +3397,55 @@ class GameController:
         
         self.current_state = GameState(board=chess.Board(), current_player=chess.WHITE)
         self.flipped = False
-        self.move_history_forward = []
+        # deque: undo/redo lucrează la capătul din stânga (appendleft/
+        # popleft), unde lista plătea O(n) pe insert(0)/pop(0)
+        self.move_history_forward: Deque[Tuple[str, chess.Move]] = deque()
         self.current_suggestions = []
         
         self.total_matching_traps = 0
-        
+
+        # Rect-urile butoanelor din ultimul frame randat; handler-ul de
+        # click le refolosește în loc să re-randeze panourile pe suprafețe
+        # de unică folosință doar ca să recupereze geometria
+        self._last_button_rects: Dict[str, pygame.Rect] = {}
+        # Indexul y-sortat peste rect-uri, construit leneș la primul click
+        # de după un frame randat (None = învechit)
+        self._button_y_index = None
+
+        # Cache de sugestii per (zobrist, culoare) - un mic transposition
+        # table: undo/redo și navigarea prin istoric revin des pe aceleași
+        # poziții. Se golește la orice mutație a bazei de capcane.
+        self._suggestion_cache: "OrderedDict[Tuple[int, bool], Tuple[List[MoveSuggestion], int]]" = OrderedDict()
+
+        # Info-ul de deschidere se recalculează doar când se schimbă poziția
+        # (mutare/navigare/joc nou), nu la fiecare frame de 60 Hz
+        self._cached_phase_info: Tuple[str, str] = ("", "")
+        self._phase_info_dirty = True
+
+        # Redesenăm doar când s-a schimbat ceva vizibil; True la start ca
+        # primul frame să se deseneze
+        self._dirty = True
+
         print("[DEBUG INIT] GameController initialization complete! Will start game directly.")
     
     def run(self) -> None:
         print("[DEBUG MAIN] Starting main game loop...")
         clock = pygame.time.Clock()
         running = True
-        
+        frame_idx = 0
+
         # Pornim primul joc implicit ca Alb
         self._start_game(chess.WHITE)
 
         while running:
-            if self.qt_app:
+            # processEvents per frame costă dispatcher-ul Qt chiar și fără
+            # nicio fereastră Qt deschisă; îl apelăm doar când există o
+            # fereastră activă, plus la fiecare al 5-lea frame ca să se
+            # scurgă semnalele/deleteLater-urile rămase în coadă
+            if self.qt_app and (self.qt_app.activeWindow() is not None
+                                or frame_idx % 5 == 0):
                 self.qt_app.processEvents()
+            frame_idx += 1
             
             events = pygame.event.get()
             
@@ -2103,59 +3453,107 @@ class GameController:
                 # `text_input_visual` nu mai este folosit, putem elimina referințele la el dacă dorim
                 pass
 
+            is_qt_window_active = self.qt_app is not None and self.qt_app.activeWindow() is not None
+
+            # Mouse-ul cu polling mare poate livra zeci de MOUSEMOTION pe
+            # frame; doar ultima poziție contează pentru randare
+            last_motion: Optional[Tuple[int, int]] = None
+
             for event in events:
                 if event.type == pygame.QUIT:
                     running = False
-                
-                is_qt_window_active = self.qt_app and self.qt_app.activeWindow() is not None
+
                 if is_qt_window_active:
                     continue
 
                 if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
                     # Acum se apelează direct handler-ul de joc
                     self._handle_game_mousedown(event.pos)
-                
+                    self._dirty = True
+
                 elif event.type == pygame.MOUSEBUTTONUP and event.button == 1:
                     if not self.current_state.is_recording and self.current_state.dragging_piece:
                         self._handle_game_mouseup(event.pos)
-                
+                    self._dirty = True
+
                 elif event.type == pygame.MOUSEMOTION:
                     if not self.current_state.is_recording and self.current_state.dragging_piece:
-                        self.current_state.drag_pos = event.pos
+                        last_motion = event.pos
 
                 elif event.type == pygame.KEYDOWN:
-                     # Am scos verificarea pentru text input, deoarece a fost eliminată
-                     pass
+                    # Enter în timpul înregistrării = cerere de salvare;
+                    # un handler pe eveniment, nu poll de tastatură per frame
+                    if event.key == pygame.K_RETURN and self.current_state.is_recording:
+                        self._handle_stop_recording_request(self.current_state.move_history)
 
+            # Aplicăm o singură dată ultima poziție de drag din batch
+            if last_motion is not None:
+                self.current_state.drag_pos = last_motion
+                self._dirty = True
+
+            # Redesenare la revenirea dintr-un dialog Qt, ca fereastra
+            # pygame să nu rămână cu ultimul frame vechi
+            if is_qt_window_active:
+                self._dirty = True
 
             # --- Randarea Pygame ---
-            self.screen.fill((30, 30, 30))
-            
-            # Randăm direct ecranul de joc
-            # --- AICI ESTE MODIFICAREA ---
-            total_matching = self.total_matching_traps
-            
-            all_buttons = self.renderer.render_control_panel(self.screen, self.current_state, self.current_state.move_history)
-            
-            suggestion_buttons = self.renderer.render_suggestions_panel(
-                self.screen, self.current_state, self.current_suggestions, total_matching
-            )
-            
-            white_info, black_info = self.opening_db.get_opening_phase_info(
-                self.current_state.board, 
-                self.current_state.move_history
-            )
-            
-            self.renderer.render_board(self.screen, self.current_state, self.flipped)
-            self.renderer.render_pieces(
-                self.screen, self.current_state.board, self.piece_loader,
-                self.current_state.selected_square, self.flipped,
-                self.current_state.dragging_piece, self.current_state.drag_pos
-            )
-            self.renderer.render_status(self.screen, self.current_state, white_info, black_info)
+            # Frame-urile fără nicio schimbare nu se redesenează deloc:
+            # CPU-ul pe idle scade la aproape zero între interacțiuni
+            was_dirty = self._dirty
+            if self._dirty:
+                self._dirty = False
+                self.screen.fill((30, 30, 30))
 
-            pygame.display.flip()
-            clock.tick(60)
+                # Randăm direct ecranul de joc
+                # --- AICI ESTE MODIFICAREA ---
+                total_matching = self.total_matching_traps
+
+                all_buttons = self.renderer.render_control_panel(self.screen, self.current_state, self.current_state.move_history)
+
+                suggestion_buttons = self.renderer.render_suggestions_panel(
+                    self.screen, self.current_state, self.current_suggestions, total_matching
+                )
+
+                # Geometria butoanelor din frame-ul curent, pentru handler-ul
+                # de click; repopulăm același dict în loc să alocăm unul nou
+                # la fiecare frame randat
+                self._last_button_rects.clear()
+                self._last_button_rects.update(all_buttons)
+                self._last_button_rects.update(suggestion_buttons)
+                # Doar marcăm indexul ca învechit; îl reconstruim la click,
+                # nu la fiecare frame randat
+                self._button_y_index = None
+
+                # Recalculăm info-ul de deschidere doar după o schimbare de poziție
+                if self._phase_info_dirty:
+                    self._cached_phase_info = self.opening_db.get_opening_phase_info(
+                        self.current_state.board,
+                        self.current_state.move_history,
+                        board_hash=self.current_state.zobrist()
+                    )
+                    self._phase_info_dirty = False
+                white_info, black_info = self._cached_phase_info
+
+                self.renderer.render_board(self.screen, self.current_state, self.flipped)
+                self.renderer.render_pieces(
+                    self.screen, self.current_state.board, self.piece_loader,
+                    self.current_state.selected_square, self.flipped,
+                    self.current_state.dragging_piece, self.current_state.drag_pos
+                )
+                self.renderer.render_status(self.screen, self.current_state, white_info, black_info)
+
+                self.renderer.present()
+
+            if was_dirty:
+                clock.tick(60)
+            else:
+                # Pe idle blocăm pe următorul eveniment (max 250 ms, ca
+                # Qt-ul să-și scurgă periodic coada) în loc să ne trezim
+                # de 60 de ori pe secundă; evenimentul primit se repune
+                # în coadă și e procesat de iterația următoare
+                event = pygame.event.wait(250)
+                if event.type != pygame.NOEVENT:
+                    pygame.event.post(event)
         
         print("[DEBUG MAIN] Main loop ended")
         pygame.quit()
@@ -2176,8 +3574,9 @@ class GameController:
         )
         
         self.flipped = (color == chess.BLACK)
-        self.move_history_forward = []
-        
+        self.move_history_forward = deque()
+        self._phase_info_dirty = True
+
         if not is_recording:
             self._update_suggestions()
         else:
@@ -2195,7 +3594,7 @@ class GameController:
                 recording_history=[]
             )
             self.flipped = (self.current_state.current_player == chess.BLACK)
-            self.move_history_forward = []
+            self.move_history_forward = deque()
             self.current_suggestions = [] # Ascundem sugestiile
             self._clear_highlights()
 
@@ -2220,69 +3619,58 @@ class GameController:
         # Setăm "No" ca buton implicit (cel care este activat de tasta Enter)
         msg_box.setDefaultButton(QMessageBox.StandardButton.No)
         
-        # Executăm dialogul și așteptăm răspunsul utilizatorului
-        # Deoarece bucla Qt rulează în fundal, acest lucru nu va bloca Pygame complet
-        response = msg_box.exec()
-        
-        # Verificăm ce buton a fost apăsat
-        if response == QMessageBox.StandardButton.Yes:
+        # open() + finished în loc de exec(): exec() pornește o buclă de
+        # evenimente locală care blochează run() până la închiderea
+        # dialogului, deci Pygame îngheață. Cu open() dialogul rămâne modal
+        # dar controlul revine imediat, iar processEvents din bucla
+        # principală îl ține viu; răspunsul sosește prin semnalul finished.
+        def on_decision(response: int) -> None:
+            self._active_dialog = None
+            if response != QMessageBox.StandardButton.Yes:
+                print("[DB] Deletion cancelled by user.")
+                return
             print("[DB] User confirmed deletion. Clearing all traps...")
             try:
-                with sqlite3.connect(self.trap_repository.db_path) as conn:
-                    conn.execute("DELETE FROM traps")
-                
-                # Re-inițializăm cache-ul din serviciu
-                self.trap_service.all_traps = []
-                
+                # Prin repository, ca să-și invalideze cache-urile de
+                # rânduri și de COUNT - nu pe o conexiune separată
+                self.trap_repository.clear_all_traps()
+
+                # Re-inițializăm serviciul ca să scape de indexul vechi;
+                # unlink(missing_ok=True) evită dansul exists+remove (TOCTOU)
+                Path(TrapService.CACHE_FILE_PATH).unlink(missing_ok=True)
+                self.trap_service = TrapService(self.trap_repository)
+
                 # Afișăm un dialog de succes, tot cu PySide6
                 QMessageBox.information(None, "Success", "The trap database has been successfully cleared.")
+                self._invalidate_suggestion_cache()
                 self._update_suggestions() # Actualizăm UI-ul Pygame
             except Exception as e:
                 QMessageBox.critical(None, "Error", f"Failed to clear the database: {e}")
                 print(f"[DB ERROR] {e}")
-        else:
-            print("[DB] Deletion cancelled by user.")
+
+        msg_box.finished.connect(on_decision)
+        self._active_dialog = msg_box  # GC protection cât e deschis
+        msg_box.open()
     
     def _handle_game_mousedown(self, pos: Tuple[int, int]) -> None:
         """Handle mouse down events during main game."""
         
-        # Colectăm TOATE butoanele active de pe ecran într-un singur loc
-        all_button_rects = {}
-        
-        # 1. Butoanele din panoul de control (inclusiv noul "Copy PGN")
-        # --- AICI ESTE CORECȚIA ---
-        control_rects = self.renderer.render_control_panel(
-            pygame.Surface((self.config.BUTTONS_WIDTH, self.config.HEIGHT)), 
-            self.current_state, 
-            self.current_state.move_history  # Am adăugat argumentul lipsă
-        )
-        all_button_rects.update(control_rects)
-        
-        # 2. Butoanele din panoul de sugestii
-        total_matching = self.total_matching_traps
-        suggestion_rects = self.renderer.render_suggestions_panel(
-            pygame.Surface((self.config.SUGGESTIONS_WIDTH, self.config.HEIGHT)),
-            self.current_state,
-            self.current_suggestions, 
-            total_matching
-        )
-        all_button_rects.update(suggestion_rects)
-
-        # Verificăm dacă s-a dat click pe vreun buton
-        action = self.input_handler.handle_button_click(pos, all_button_rects)
+        # Refolosim rect-urile butoanelor din ultimul frame randat - nu mai
+        # re-randăm panourile pe suprafețe de unică folosință la fiecare click
+        if self._button_y_index is None and self._last_button_rects:
+            self._button_y_index = InputHandler.build_button_y_index(self._last_button_rects)
+        action = self.input_handler.handle_button_click(
+            pos, self._last_button_rects, self._button_y_index)
         
         if action:
             # Tratăm acțiunile de la butoane, inclusiv "copy_pgn"
             if action == "copy_pgn":
-                history_text = ""
-                for i, move in enumerate(self.current_state.move_history):
-                    if i % 2 == 0:
-                        history_text += f"{i//2 + 1}. {move} "
-                    else:
-                        history_text += f"{move} "
-                
-                pyperclip.copy(history_text.strip())
-                print(f"[CLIPBOARD] Copiat: {history_text.strip()}")
+                # Refolosim formatarea incrementală a panoului de istoric
+                history_text = self.renderer.get_history_text(
+                    tuple(self.current_state.move_history))
+
+                pyperclip.copy(history_text)
+                print(f"[CLIPBOARD] Copiat: {history_text}")
             else:
                 # Tratăm celelalte acțiuni
                 print(f"[DEBUG] Button action: {action}")
@@ -2354,15 +3742,24 @@ class GameController:
     
     def _try_make_move(self, from_square: chess.Square, to_square: chess.Square) -> None:
         """Try to make a move from one square to another."""
+        board = self.current_state.board
+        # Ieșire rapidă înainte de orice verificare de legalitate: pătrat
+        # gol sau piesa adversarului nu pot produce o mutare validă
+        piece = board.piece_at(from_square)
+        if piece is None or piece.color != board.turn:
+            print(f"[DEBUG] No own piece on {chess.square_name(from_square)}, ignoring.")
+            return
+
         move = chess.Move(from_square, to_square)
-        
+
         # Handle pawn promotion
-        piece = self.current_state.board.piece_at(from_square)
-        if (piece and piece.piece_type == chess.PAWN and 
+        if (piece.piece_type == chess.PAWN and
             chess.square_rank(to_square) in [0, 7]):
             move.promotion = chess.QUEEN
-        
-        if move in self.current_state.board.legal_moves:
+
+        # is_legal() testează doar mutarea dată; `in legal_moves` genera
+        # toate mutările legale până o găsea pe a noastră
+        if board.is_legal(move):
             print(f"[DEBUG] Making move: {move}")
             self._make_move(move)
         else:
@@ -2373,21 +3770,36 @@ class GameController:
         self.current_state.highlighted_squares = None
         self.current_state.highlight_color = None
 
+    def _set_active_trap_line(self, line: Optional[List[str]]) -> None:
+        """Set the followed trap line and its pre-cleaned (+/# stripped) twin."""
+        self.current_state.active_trap_line = line
+        self.current_state.active_trap_line_clean = (
+            None if line is None
+            else [m.translate(_SAN_DECOR_TABLE) for m in line])
+
     def _handle_board_click(self, pos: Tuple[int, int]) -> None:
         """Handle clicks on the chess board (legacy method - kept for compatibility)."""
         # This method is now replaced by _handle_board_mousedown and _handle_board_mouseup
         # but kept here in case it's called from somewhere else
         self._handle_board_mousedown(pos)
     
-    def _make_move(self, move: chess.Move) -> None:
-        """Applies a move to the board and updates game state."""
-        
-        # Calculăm SAN-ul înainte de a modifica tabla
-        move_san = self.current_state.board.san(move)
-        
-        # Aplicăm mutarea pe tablă
-        self.current_state.board.push(move)
-        
+    def _make_move(self, move: chess.Move, move_san: Optional[str] = None) -> None:
+        """Applies a move to the board and updates game state.
+
+        SAN-ul rămâne moneda istoricului (potrivirea capcanelor, sugestiile și
+        panoul de istoric lucrează pe SAN), deci nu-l putem amâna de tot;
+        în schimb san_and_push() îl calculează și împinge mutarea într-o
+        singură trecere (san() separat făcea push/pop intern pentru sufixul
+        de șah, apoi împingeam din nou), iar apelanții care îl știu deja
+        (redo) îl pot pasa ca să sară complet peste recalculare.
+        """
+        if move_san is None:
+            move_san = self.current_state.board.san_and_push(move)
+        else:
+            self.current_state.board.push(move)
+        self.current_state.board_hash = None
+        self._phase_info_dirty = True
+
         # Resetăm starea de UI
         self.current_state.selected_square = None
         self.current_state.dragging_piece = None
@@ -2401,11 +3813,13 @@ class GameController:
 
         # --- Logica pentru modul de joc normal ---
         moving_color = not self.current_state.board.turn # Culoarea care tocmai a mutat
-        move_san_clean = move_san.replace('+', '').replace('#', '')
+        move_san_clean = move_san.translate(_SAN_DECOR_TABLE)
         active_trap_line = self.current_state.active_trap_line
-        
+        # Varianta deja curățată, construită la selectarea sugestiei
+        trap_line_clean = self.current_state.active_trap_line_clean
+
         self.current_state.move_history.append(move_san)
-        self.move_history_forward = []
+        self.move_history_forward = deque()
         
         self._clear_highlights()
         
@@ -2414,11 +3828,10 @@ class GameController:
             self.current_state.trap_success_message = None
 
             if active_trap_line:
-                expected_move_clean = active_trap_line[0].replace('+', '').replace('#', '')
-                if move_san_clean == expected_move_clean:
+                if move_san_clean == trap_line_clean[0]:
                     if len(active_trap_line) == 1:
                         self.current_state.trap_success_message = "Trap Successful!\nOpponent's position is lost."
-                        self.current_state.active_trap_line = None
+                        self._set_active_trap_line(None)
                         print("[DEBUG] TRAP COMPLETE!")
                     else:
                         try:
@@ -2429,41 +3842,77 @@ class GameController:
                             print(f"[DEBUG] Following trap. Highlighting: {opponent_response_san}")
                         except Exception as e:
                             print(f"[ERROR] Could not highlight next move: {e}")
-                            self.current_state.active_trap_line = None
+                            self._set_active_trap_line(None)
                 else:
-                    self.current_state.active_trap_line = None
-        
+                    self._set_active_trap_line(None)
+
         else: # Rândul adversarului
             if active_trap_line and len(active_trap_line) > 1:
-                expected_opponent_move_clean = active_trap_line[1].replace('+', '').replace('#', '')
-                if move_san_clean == expected_opponent_move_clean:
+                if move_san_clean == trap_line_clean[1]:
+                    # Tăiem ambele liste în paralel, fără re-curățare
                     self.current_state.active_trap_line = active_trap_line[2:]
+                    self.current_state.active_trap_line_clean = trap_line_clean[2:]
                 else:
-                    self.current_state.active_trap_line = None
+                    self._set_active_trap_line(None)
             else:
-                self.current_state.active_trap_line = None
-            
+                self._set_active_trap_line(None)
+
             self._update_suggestions()
         
+    # Limita transposition table-ului de sugestii; peste ea evacuăm LRU
+    SUGGESTION_CACHE_SIZE = 4096
+
     def _update_suggestions(self) -> None:
+        # Orice actualizare de sugestii trebuie să ajungă pe ecran
+        self._dirty = True
         if self.current_state.board.turn != self.current_state.current_player or self.current_state.is_recording:
             self.current_suggestions = []
             self.total_matching_traps = 0
             return
 
+        cache_key = (self.current_state.zobrist(),
+                     self.current_state.current_player)
+        cached = self._suggestion_cache.get(cache_key)
+        if cached is not None:
+            self._suggestion_cache.move_to_end(cache_key)
+            self.current_suggestions, self.total_matching_traps = cached
+            return
+
         checkmate_suggs = self.trap_service.get_aggregated_suggestions(self.current_state)
         custom_suggs = self.queen_trap_service.get_aggregated_suggestions(self.current_state)
-        
-        all_suggs = checkmate_suggs + custom_suggs
-        all_suggs.sort(key=lambda s: (s.trap_type == 'checkmate', -s.trap_count))
+
+        # Partiționăm după trap_type, nu după serviciul sursă - și serviciul
+        # custom emite linii de mat înregistrate. Cheia istorică era
+        # (s.trap_type == 'checkmate', -s.trap_count): queen hunter înaintea
+        # capcanelor de mat, fiecare bucket descrescător după trap_count;
+        # top-K per bucket cu un attrgetter în C păstrează exact ordinea.
+        by_count = operator.attrgetter('trap_count')
+        hunter_suggs, mate_suggs = [], []
+        for sugg in chain(custom_suggs, checkmate_suggs):
+            if sugg.trap_type == 'checkmate':
+                mate_suggs.append(sugg)
+            else:
+                hunter_suggs.append(sugg)
+        all_suggs = heapq.nlargest(self.MAX_SUGGESTIONS, hunter_suggs, key=by_count)
+        if len(all_suggs) < self.MAX_SUGGESTIONS:
+            all_suggs += heapq.nlargest(self.MAX_SUGGESTIONS - len(all_suggs),
+                                        mate_suggs, key=by_count)
         self.current_suggestions = all_suggs
-        
+
         total_checkmates = self.trap_service.count_matching_traps(self.current_state)
         total_customs = self.queen_trap_service.count_matching_traps(self.current_state)
         self.total_matching_traps = total_checkmates + total_customs
 
+        self._suggestion_cache[cache_key] = (all_suggs, self.total_matching_traps)
+        if len(self._suggestion_cache) > self.SUGGESTION_CACHE_SIZE:
+            self._suggestion_cache.popitem(last=False)
+
         print(f"[DEBUG] Updated suggestions. Unique moves: {len(all_suggs)}. Total matching lines: {self.total_matching_traps}")
 
+    def _invalidate_suggestion_cache(self) -> None:
+        """Dropped whenever the trap database changes - cached entries would lie."""
+        self._suggestion_cache.clear()
+
     def _manage_queen_traps(self):
         """Opens the Queen Trap management dialog."""
         if not QT_AVAILABLE:
@@ -2473,6 +3922,7 @@ class GameController:
         def on_trap_deleted_callback():
             print("[CONTROLLER] A custom trap was deleted. Forcing fast-cache service reload.")
             self.queen_trap_service.force_reload()
+            self._invalidate_suggestion_cache()
             self._update_suggestions()
 
         # --- MODIFICAREA AICI ---
@@ -2482,17 +3932,12 @@ class GameController:
             on_trap_deleted_callback,
             on_trap_load=self.load_moves_onto_board # Aici conectăm metoda
         )
-        dialog.exec()
+        # open() în loc de exec() - tabla Pygame rămâne vie (și se poate
+        # redesena după load_moves_onto_board) cât timp managerul e deschis
+        dialog.finished.connect(lambda _result: setattr(self, '_active_dialog', None))
+        self._active_dialog = dialog
+        dialog.open()
     
-    def _update_game_state(self) -> None:
-        """Update game state each frame."""
-        # Handle text input for recording
-        if self.current_state.is_recording:
-            # Check for Enter key to stop recording
-            keys = pygame.key.get_pressed()
-            if keys[pygame.K_RETURN]:
-                self._stop_recording()
-
     def _select_suggestion(self, suggestion: MoveSuggestion):
         """Highlights the board based on a selected suggestion without making a move."""
         try:
@@ -2502,8 +3947,8 @@ class GameController:
             self.current_state.highlight_color = self.config.HIGHLIGHT_RED
             
             # Salvăm linia de capcană pe care intenționăm să o urmăm
-            self.current_state.active_trap_line = suggestion.example_trap_line
-            
+            self._set_active_trap_line(suggestion.example_trap_line)
+
             print(f"[DEBUG] Suggestion '{suggestion.suggested_move}' selected. Highlighting in red.")
 
         except ValueError:
@@ -2565,18 +4010,31 @@ class GameController:
                 QMessageBox.information(None, "Nothing to Record", "Play some moves first before recording a trap.")
             return
 
-        detected_type, winning_color = self._analyze_recorded_line(moves_to_analyze)
+        detected_type, winning_color, final_board = self._analyze_recorded_line(moves_to_analyze)
+
+        def on_decision(decision: int) -> None:
+            self._active_dialog = None
+            self._apply_record_decision(decision, detected_type, winning_color,
+                                        moves_to_analyze, final_board)
 
-        decision = None
         if QT_AVAILABLE:
-            decision = QtSaveConfirmDialog.get_decision(detected_type, moves_to_analyze)
+            # Non-blocant: get_decision() făcea exec() și îngheța Pygame cât
+            # timp era deschis dialogul; cu open() decizia vine prin finished
+            dialog = QtSaveConfirmDialog(detected_type, moves_to_analyze)
+            dialog.finished.connect(lambda _result: on_decision(dialog.result))
+            self._active_dialog = dialog
+            dialog.open()
         else:
             # Fallback pentru testare fără Qt
-            decision = QtSaveConfirmDialog.SAVE
+            on_decision(QtSaveConfirmDialog.SAVE)
 
+    def _apply_record_decision(self, decision: int, detected_type: str,
+                               winning_color, moves_to_analyze: List[str],
+                               final_board) -> None:
+        """Applies the user's choice from the save-confirmation dialog."""
         if decision == QtSaveConfirmDialog.SAVE:
             print("[REC] User chose to save the trap.")
-            self._save_trap_logic(detected_type, winning_color, moves_to_analyze)
+            self._save_trap_logic(detected_type, winning_color, moves_to_analyze, final_board)
             # După salvare, actualizăm sugestiile pentru poziția curentă.
             # Asta e tot, nicio resetare.
             self._update_suggestions()
@@ -2592,22 +4050,28 @@ class GameController:
     def _go_back_one(self) -> None:
         """Go back one move in the current game history."""
         if self.current_state.move_history:
-            self.current_state.board.pop()
-            self.move_history_forward.insert(0, self.current_state.move_history.pop())
+            # Păstrăm și obiectul Move, ca redo-ul să nu mai treacă prin
+            # parse_san (care enumeră mutările legale pentru dezambiguizare)
+            last_move = self.current_state.board.pop()
+            self.current_state.board_hash = None
+            self.move_history_forward.appendleft(
+                (self.current_state.move_history.pop(), last_move))
+            self._phase_info_dirty = True
             self._clear_highlights()
             self._update_suggestions()
 
     def _go_forward_one(self) -> None:
         """Go forward one move if available."""
         if self.move_history_forward:
-            next_move_san = self.move_history_forward.pop(0)
-            try:
-                move = self.current_state.board.parse_san(next_move_san)
-                # Re-folosim _make_move pentru a menține consistența stării
-                self._make_move(move)
-            except ValueError:
+            next_move_san, next_move = self.move_history_forward.popleft()
+            if self.current_state.board.is_legal(next_move):
+                # Re-folosim _make_move pentru a menține consistența stării;
+                # obiectul Move salvat la undo sare peste parse_san, iar
+                # SAN-ul memorat sare și peste recalcularea lui
+                self._make_move(next_move, next_move_san)
+            else:
                 # Dacă mutarea e invalidă, o punem la loc pentru a nu o pierde
-                self.move_history_forward.insert(0, next_move_san)
+                self.move_history_forward.appendleft((next_move_san, next_move))
  
     def _go_to_end(self) -> None:
         """Go to the end of the game (the last known position)."""
@@ -2617,7 +4081,10 @@ class GameController:
         # Asigură-te că și la final, orice highlight este curățat
         self._clear_highlights()
 
-    def _analyze_recorded_line(self, moves_san: List[str]) -> Tuple[str, Optional[chess.Color]]:
+    def _analyze_recorded_line(self, moves_san: List[str]
+                               ) -> Tuple[str, Optional[chess.Color], Optional[chess.Board]]:
+        """Classify a recorded line; also returns the final board so the
+        save path doesn't have to replay the SAN sequence a second time."""
         board = chess.Board()
         last_move_obj = None
         try:
@@ -2627,34 +4094,42 @@ class GameController:
                 board.push(last_move_obj)
         except ValueError as e:
             print(f"[ANALYZE ERROR] Failed to parse sequence: {e}")
-            return "Invalid Move Sequence", None
+            return "Invalid Move Sequence", None, None
 
         # De aici, restul metodei rămâne la fel...
         if board.is_checkmate():
-            return "Checkmate", not board.turn
-
-        board_before_last = board.copy()
-        board_before_last.pop()
-        captured = board_before_last.piece_at(last_move_obj.to_square)
+            return "Checkmate", not board.turn, board
+
+        # Inspectăm poziția dinaintea ultimei mutări cu pop/push pe aceeași
+        # tablă - board.copy() clona toate bitboard-urile și stivele doar
+        # pentru o citire
+        board.pop()
+        captured = board.piece_at(last_move_obj.to_square)
+        pre_move_turn = board.turn
+        board.push(last_move_obj)
         if captured and captured.piece_type == chess.QUEEN:
-            return "Direct Queen Capture", board_before_last.turn
+            return "Direct Queen Capture", pre_move_turn, board
 
         attacker_square = last_move_obj.to_square
         attacker_piece = board.piece_at(attacker_square)
         if attacker_piece:
             opponent_color = not attacker_piece.color
-            king_sq = board.king(opponent_color)
-            queen_sq_set = board.pieces(chess.QUEEN, opponent_color)
-            if king_sq and queen_sq_set:
-                queen_sq = queen_sq_set.pop()
-                is_fork = attacker_square in board.attackers(attacker_piece.color, king_sq) and \
-                          attacker_square in board.attackers(attacker_piece.color, queen_sq)
-                if is_fork:
-                    return "Royal Fork", attacker_piece.color
-
-        return "Standard Line", None
-    
-    def _save_trap_logic(self, detected_type: str, winning_color: Optional[chess.Color], moves: List[str]):
+            # Detecția de furculiță direct pe bitboard-uri: attacks_mask
+            # întoarce într-un singur apel toate pătrățelele atacate de piesa
+            # mutată, deci testul devine două AND-uri pe întregi de 64 de biți
+            # în loc de două SquareSet-uri construite de board.attackers()
+            opponent_occupied = board.occupied_co[opponent_color]
+            king_bb = board.kings & opponent_occupied
+            queen_bb = board.queens & opponent_occupied
+            if king_bb and queen_bb:
+                attacks = board.attacks_mask(attacker_square)
+                if attacks & king_bb and attacks & queen_bb:
+                    return "Royal Fork", attacker_piece.color, board
+
+        return "Standard Line", None, board
+
+    def _save_trap_logic(self, detected_type: str, winning_color: Optional[chess.Color],
+                         moves: List[str], final_board: Optional[chess.Board] = None):
         """
         Saves ANY manually recorded trap (checkmate or queen loss) to the
         'custom traps' system (originally the queen trap system) for fast,
@@ -2671,14 +4146,17 @@ class GameController:
         
         # Pentru 'capture_square', folosim o valoare generică (0) dacă e mat,
         # altfel calculăm pătrățelul reginei.
-        capture_square = 0 
+        capture_square = 0
         if detected_type in ["Direct Queen Capture", "Royal Fork"]:
-            final_board = chess.Board()
-            for move_san in moves: 
-                # Parsăm o versiune curată a mutării
-                clean_san = move_san.replace('#','').replace('+','')
-                final_board.push(final_board.parse_san(clean_san))
-            
+            if final_board is None:
+                # Fallback pentru apelanți care nu vin prin _analyze_recorded_line;
+                # parse_san e partea scumpă (enumeră mutările legale per pas)
+                final_board = chess.Board()
+                for move_san in moves:
+                    # Parsăm o versiune curată a mutării
+                    clean_san = move_san.replace('#','').replace('+','')
+                    final_board.push(final_board.parse_san(clean_san))
+
             opponent_color = not winning_color
             queen_square_set = final_board.pieces(chess.QUEEN, opponent_color)
             if queen_square_set:
@@ -2700,6 +4178,7 @@ class GameController:
             new_custom_trap.id = trap_id
             # Forțăm reîncărcarea serviciului rapid (queen trap service), care este instantaneu
             self.queen_trap_service.force_reload()
+            self._invalidate_suggestion_cache()
             print(f"[DB] Saved custom trap '{trap_name}' to the fast index.")
             if QT_AVAILABLE:
                 QMessageBox.information(None, "Success", f"Successfully saved custom trap: {detected_type}")
@@ -2717,18 +4196,26 @@ class GameController:
         def start_import_logic(filepath, max_moves, checkmate_only):
             print(f"[IMPORT] Starting import with settings...")
             pygame.mouse.set_cursor(pygame.SYSTEM_CURSOR_WAIT)
-            
-            white_count, black_count = self.pgn_service.import_from_file(filepath, max_moves, checkmate_only)
-            
-            pygame.mouse.set_cursor(pygame.SYSTEM_CURSOR_ARROW)
-            
-            QMessageBox.information(None, "Import Complete", f"Successfully imported:\n- {white_count} white traps\n- {black_count} black traps")
-            
-            # După import, forțăm reîmprospătarea datelor
-            if os.path.exists(TrapService.CACHE_FILE_PATH):
-                os.remove(TrapService.CACHE_FILE_PATH)
-            self.trap_service = TrapService(self.trap_repository)
-            self._update_suggestions()
+
+            # Importul rulează pe un QThread separat: pygame și Qt își împart
+            # firul principal, deci apelul blocant de aici îngheța complet
+            # UI-ul pe durata importului. Semnalele sunt livrate înapoi pe
+            # firul principal prin coada de evenimente Qt (conexiune queued),
+            # pe care bucla principală o golește oricum cu processEvents().
+            self._import_thread = QThread()
+            self._import_worker = PgnImportWorker(self.pgn_service, filepath,
+                                                 max_moves, checkmate_only)
+            self._import_worker.moveToThread(self._import_thread)
+            self._import_thread.started.connect(self._import_worker.run)
+            self._import_worker.progress.connect(
+                lambda games: print(f"[IMPORT] ... {games} games read"),
+                Qt.ConnectionType.QueuedConnection)
+            self._import_worker.finished.connect(self._on_import_finished,
+                                                 Qt.ConnectionType.QueuedConnection)
+            self._import_worker.finished.connect(self._import_thread.quit)
+            self._import_thread.finished.connect(self._import_worker.deleteLater)
+            self._import_thread.finished.connect(self._import_thread.deleteLater)
+            self._import_thread.start()
 
         # Creăm și afișăm fereastra de dialog, pasând TOATE callback-urile necesare
         # --- AICI ESTE CORECȚIA ---
@@ -2740,7 +4227,20 @@ class GameController:
             self._manage_queen_traps  # Am adăugat argumentul lipsă
         )
         dialog.exec()
-        
+
+    def _on_import_finished(self, white_count: int, black_count: int,
+                            added_ids: List[int]) -> None:
+        """Runs on the main thread once the import worker is done."""
+        pygame.mouse.set_cursor(pygame.SYSTEM_CURSOR_ARROW)
+
+        QMessageBox.information(None, "Import Complete", f"Successfully imported:\n- {white_count} white traps\n- {black_count} black traps")
+
+        # După import, aplicăm doar delta pe indexul din memorie, în loc să
+        # ștergem cache-ul și să rescanăm toată tabela
+        self.trap_service.apply_delta(added_ids)
+        self._invalidate_suggestion_cache()
+        self._update_suggestions()
+
     def _import_pgn_folder(self) -> None:
         """Opens a folder dialog using PySide6 to select a directory."""
         if not QT_AVAILABLE:
@@ -2766,39 +4266,63 @@ class GameController:
             print("[IMPORT] Folder selection cancelled.")
 
     def _run_database_audit(self, max_moves: int):
-        """Orchestrates the database audit and refreshes the application state ONLY if changes were made."""
+        """Starts the database audit on a worker thread, with progress + Cancel."""
         print("[CONTROLLER] Starting database audit process...")
-        pygame.mouse.set_cursor(pygame.SYSTEM_CURSOR_WAIT)
 
-        # 1. Creează și rulează auditorul
-        auditor = DatabaseAuditor(self.trap_repository)
-        report, changes_were_made = auditor.run_audit(max_moves)
-        
-        pygame.mouse.set_cursor(pygame.SYSTEM_CURSOR_ARROW)
-
-        # 2. Afișează raportul
-        QMessageBox.information(self.qt_app.activeWindow(), "Audit Report", report)
-        
-        # 3. CRUCIAL: Reîmprospătează datele aplicației DOAR DACĂ A FOST NECESAR
+        # Ca la import: auditul rulează pe un QThread ca scanarea completă
+        # a tabelei să nu înghețe UI-ul; un QProgressDialog cu buton de
+        # Cancel urmărește progresul raportat prin semnale
+        self._audit_thread = QThread()
+        self._audit_worker = AuditWorker(self.trap_repository, max_moves)
+        self._audit_worker.moveToThread(self._audit_thread)
+        self._audit_thread.started.connect(self._audit_worker.run)
+
+        progress_dialog = QProgressDialog("Auditing database...", "Cancel", 0, 100,
+                                          self.qt_app.activeWindow())
+        progress_dialog.setWindowTitle("Database Audit")
+        progress_dialog.setMinimumDuration(0)
+        progress_dialog.canceled.connect(self._audit_worker.cancel)
+
+        def on_progress(done: int, total: int) -> None:
+            progress_dialog.setMaximum(total)
+            progress_dialog.setValue(done)
+
+        self._audit_worker.progress.connect(on_progress,
+                                            Qt.ConnectionType.QueuedConnection)
+        self._audit_worker.finished.connect(
+            partial(self._on_audit_finished, progress_dialog),
+            Qt.ConnectionType.QueuedConnection)
+        self._audit_worker.finished.connect(self._audit_thread.quit)
+        self._audit_thread.finished.connect(self._audit_worker.deleteLater)
+        self._audit_thread.finished.connect(self._audit_thread.deleteLater)
+        self._audit_thread.start()
+
+    def _on_audit_finished(self, progress_dialog, report: str, changes_were_made: bool,
+                           removed_ids: List[int],
+                           color_updates: List[Tuple[bool, int]]) -> None:
+        """Runs on the main thread once the audit worker is done."""
+        progress_dialog.close()
+
+        # Interogăm stiva de ferestre Qt o singură dată pentru toate dialogurile
+        parent_window = self.qt_app.activeWindow()
+
+        # Afișează raportul
+        QMessageBox.information(parent_window, "Audit Report", report)
+
+        # CRUCIAL: Reîmprospătează datele aplicației DOAR DACĂ A FOST NECESAR
         if changes_were_made:
-            print("[CONTROLLER] Audit made changes. Refreshing TrapService and suggestions...")
-            
-            # Șterge fișierul cache dacă există, forțând reconstruirea lui
-            if os.path.exists(TrapService.CACHE_FILE_PATH):
-                try:
-                    os.remove(TrapService.CACHE_FILE_PATH)
-                    print("[CONTROLLER] Removed stale cache file.")
-                except OSError as e:
-                    print(f"[CONTROLLER] Error removing cache file: {e}")
+            print("[CONTROLLER] Audit made changes. Patching TrapService and suggestions...")
 
-            # Re-inițializează serviciul pentru a încărca datele curate
-            self.trap_service = TrapService(self.trap_repository)
+            # Auditul raportează exact ce a șters/recolorat; aplicăm doar
+            # delta pe index, fără ștergerea cache-ului și rescanarea tabelei
+            self.trap_service.apply_delta((), removed_ids, color_updates)
+            self._invalidate_suggestion_cache()
             self._update_suggestions()
             
-            QMessageBox.information(self.qt_app.activeWindow(), "Success", "Database was modified. Application data has been refreshed.")
+            QMessageBox.information(parent_window, "Success", "Database was modified. Application data has been refreshed.")
         else:
             print("[CONTROLLER] Audit found no issues. No refresh needed.")
-            QMessageBox.information(self.qt_app.activeWindow(), "Success", "Database is clean. No changes were made.")
+            QMessageBox.information(parent_window, "Success", "Database is clean. No changes were made.")
 
     def _show_database_info(self):
         """Collects and displays detailed database statistics in a Qt dialog."""
@@ -2809,27 +4333,24 @@ class GameController:
             print(f"PGN Checkmate Traps: {pgn_traps}, Manually Recorded Traps: {custom_traps}")
             return
 
-        # Colectează datele
+        # Colectează datele - doar COUNT-uri în SQL, fără a materializa
+        # vreun rând de capcană doar ca să-l numărăm în Python
         pgn_checkmates = self.trap_repository.get_total_trap_count()
-        all_custom_traps = self.queen_trap_repository.get_all_traps()
-        manually_recorded = len(all_custom_traps)
-        
-        # --- AICI ESTE A DOUA CORECȚIE (pentru robustețe) ---
-        # Numărăm explicit fiecare categorie
-        recorded_mates_count = sum(1 for trap in all_custom_traps if trap.trap_type == 'Checkmate')
+        manually_recorded = self.queen_trap_repository.get_total_trap_count()
+        recorded_mates_count = self.queen_trap_repository.count_traps_by_type('Checkmate')
         queen_hunt_count = manually_recorded - recorded_mates_count # Restul sunt de regină
         
         total_traps = pgn_checkmates + manually_recorded
         
         # Construim dicționarul pentru afișare
         stats = {
-            "PGN Checkmate Library": f"{pgn_checkmates:,}",
-            "separator1": "", 
-            "Manually Recorded Traps": f"{manually_recorded:,}",
-            "   - Queen Hunts / Forks": f"{queen_hunt_count:,}",
-            "   - Checkmates": f"<b>{recorded_mates_count:,}</b>",
+            "PGN Checkmate Library": _format_thousands(pgn_checkmates),
+            "separator1": "",
+            "Manually Recorded Traps": _format_thousands(manually_recorded),
+            "   - Queen Hunts / Forks": _format_thousands(queen_hunt_count),
+            "   - Checkmates": f"<b>{_format_thousands(recorded_mates_count)}</b>",
             "separator2": "",
-            "Total Unique Traps": f"<b>{total_traps:,}</b>"
+            "Total Unique Traps": f"<b>{_format_thousands(total_traps)}</b>"
         }
         
         # Creează și afișează dialogul
@@ -2902,6 +4423,7 @@ class GameController:
             if deleted_count > 0:
                 # CRUCIAL: Reîmprospătăm serviciul și sugestiile
                 self.queen_trap_service.force_reload()
+                self._invalidate_suggestion_cache()
                 self._update_suggestions()
                 QMessageBox.information(None, "Success", f"Successfully deleted {deleted_count} custom checkmate traps.")
                 # Închidem fereastra de statistici pentru a forța redeschiderea cu date actualizate
@@ -2936,9 +4458,11 @@ class GameController:
 
         # Actualizăm starea jocului cu noua linie
         self.current_state.move_history = temp_history
-        self.move_history_forward = [] # Nu există mutări "forward"
+        self.move_history_forward = deque() # Nu există mutări "forward"
         
         # Curățăm highlight-urile și actualizăm sugestiile pentru noua poziție
+        self.current_state.board_hash = None
+        self._phase_info_dirty = True
         self._clear_highlights()
         self._update_suggestions()
         print("[ACTION] Board position updated successfully.")
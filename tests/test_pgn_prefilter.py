@@ -0,0 +1,72 @@
+# Teste de regresie pentru pre-filtrul pe bytes al importului PGN.
+#
+# Regresia acoperită: numerele zecimale din comentariile {...} (ex. [%eval
+# 0.0]) erau luate drept numere de mutare, ultimul match devenea "0." și
+# partide valide cu mat erau respinse silențios înainte de parsare.
+#
+# Rulare: python -m pytest tests/ -q
+import importlib.util
+import os
+import sys
+import types
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+# Dependențe de UI care nu sunt necesare (și pot lipsi) într-un mediu de test
+sys.modules.setdefault("pyperclip", types.ModuleType("pyperclip"))
+_ti = types.ModuleType("pygame_textinput")
+_ti.TextInputVisualizer = object
+sys.modules.setdefault("pygame_textinput", _ti)
+
+_MODULE_PATH = os.path.join(os.path.dirname(__file__), "..", "Chess_trap_explorer.py")
+_spec = importlib.util.spec_from_file_location("cte", _MODULE_PATH)
+cte = importlib.util.module_from_spec(_spec)
+sys.modules.setdefault("cte", cte)
+_spec.loader.exec_module(cte)
+
+
+SCHOLARS_MATE_PLAIN = (
+    b'[Event "Test"]\n'
+    b'[Result "1-0"]\n'
+    b'\n'
+    b'1. e4 e5 2. Bc4 Nc6 3. Qh5 Nf6 4. Qxf7# 1-0\n'
+)
+
+# Aceeași partidă, în stilul exporturilor Lichess: comentarii de evaluare
+# după fiecare mutare, inclusiv unul cu "0.0" chiar înainte de rezultat.
+SCHOLARS_MATE_ANNOTATED = (
+    b'[Event "Test"]\n'
+    b'[Result "1-0"]\n'
+    b'\n'
+    b'1. e4 { [%eval 0.3] } 1... e5 { [%eval 0.2] } 2. Bc4 { [%eval 0.1] } '
+    b'2... Nc6 { [%eval 0.4] } 3. Qh5 { [%eval 0.0] } 3... Nf6 '
+    b'{ [%eval 6.5] } 4. Qxf7# { [%eval 0.0] } 1-0\n'
+)
+
+
+def _import_single_game(game_bytes):
+    return cte.PGNImportService._process_games_chunk(
+        [game_bytes], max_moves=20, checkmate_only=True)
+
+
+def test_plain_mate_game_is_imported():
+    white_traps, black_traps = _import_single_game(SCHOLARS_MATE_PLAIN)
+    assert len(white_traps) == 1
+    assert black_traps == []
+    assert white_traps[0].moves[-1] == "Qxf7#"
+
+
+def test_eval_annotated_mate_game_is_imported():
+    # Regresia propriu-zisă: varianta adnotată trebuie să treacă de
+    # pre-filtru exact ca cea simplă.
+    white_traps, black_traps = _import_single_game(SCHOLARS_MATE_ANNOTATED)
+    assert len(white_traps) == 1
+    assert black_traps == []
+    assert white_traps[0].moves == ["e4", "e5", "Bc4", "Nc6", "Qh5", "Nf6", "Qxf7#"]
+
+
+def test_move_number_regex_ignores_comment_decimals():
+    movetext = b'3. Qh5 Nf6 { [%eval 0.0] } 4. Qxf7# { [%eval 0.0] } 1-0'
+    cleaned = cte._PGN_COMMENT_RE.sub(b' ', movetext)
+    numbers = cte._PGN_MOVE_NUMBER_RE.findall(cleaned)
+    assert numbers == [b'3', b'4']